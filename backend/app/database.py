@@ -1,12 +1,21 @@
+import logging
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.config import get_settings
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
 engine = create_async_engine(
     settings.database_url,
     echo=False,
+    # Compiled-statement cache (default 500); sized for all service queries
+    query_cache_size=1200,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20
@@ -35,7 +44,120 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def _upgrade_json_columns(sync_conn):
+    # Tables created before the switch to JSONB still store these columns as json
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if isinstance(column.type, JSONB) and not isinstance(existing.get(column.name), JSONB):
+                sync_conn.execute(text(
+                    f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE jsonb USING {column.name}::jsonb"
+                ))
+
+
+def _add_missing_columns(sync_conn):
+    # create_all() doesn't alter existing tables, so columns added to a model later are added here
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+
+def _backfill_recipe_audio(sync_conn):
+    # Index the audio URLs of recipes saved before the recipe_audio table existed
+    sync_conn.execute(text("""
+        INSERT INTO recipe_audio (recipe_id, audio_url)
+        SELECT id, url FROM (
+            SELECT id, intro_audio_url AS url FROM recipes
+            UNION SELECT id, outro_audio_url FROM recipes
+            UNION SELECT id, ingredients_audio_url FROM recipes
+            UNION SELECT r.id, s.step ->> 'audio_url'
+                FROM recipes r, jsonb_array_elements(r.steps) AS s(step)
+                WHERE jsonb_typeof(r.steps) = 'array'
+        ) AS urls
+        WHERE url IS NOT NULL AND url <> ''
+        ON CONFLICT DO NOTHING
+    """))
+
+
+def _run_once(sync_conn, name: str, upgrade) -> None:
+    # One-off data upgrades are recorded in schema_upgrades so later startups skip them
+    sync_conn.execute(text("CREATE TABLE IF NOT EXISTS schema_upgrades (name VARCHAR(100) PRIMARY KEY)"))
+    done = sync_conn.execute(
+        text("SELECT 1 FROM schema_upgrades WHERE name = :name"), {"name": name}
+    ).first()
+    if done is None:
+        upgrade(sync_conn)
+        sync_conn.execute(text("INSERT INTO schema_upgrades (name) VALUES (:name)"), {"name": name})
+
+
+def _normalize_source_urls(sync_conn):
+    # Recipes saved before URLs were normalized on import hold the raw URL, which
+    # the lookups (and the unique owner/URL indexes) would never match again
+    from app.services.recipe_service import normalize_recipe_url
+
+    rows = sync_conn.execute(text("""
+        SELECT id, user_id, anonymous_user_id, source_url FROM recipes
+        WHERE source_url LIKE '%/' OR source_url LIKE '%?%' OR source_url LIKE '%#%'
+            OR source_url <> lower(source_url)
+    """)).all()
+    for recipe_id, user_id, anonymous_user_id, source_url in rows:
+        url = normalize_recipe_url(source_url)
+        if url == source_url:
+            continue
+        # Leave the row alone if its owner already has the normalized URL saved;
+        # rewriting it would only create the duplicate the unique indexes forbid
+        duplicate = sync_conn.execute(text("""
+            SELECT 1 FROM recipes
+            WHERE source_url = :url
+                AND (user_id = :user_id OR anonymous_user_id = :anonymous_user_id)
+            LIMIT 1
+        """), {"url": url, "user_id": user_id, "anonymous_user_id": anonymous_user_id}).first()
+        if duplicate is None:
+            sync_conn.execute(
+                text("UPDATE recipes SET source_url = :url WHERE id = :id"),
+                {"url": url, "id": recipe_id},
+            )
+
+
+def _create_missing_indexes(sync_conn):
+    # create_all() skips tables that already exist, including their indexes
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                # Savepoint, so a unique index that existing rows violate doesn't
+                # abort the rest of startup
+                with sync_conn.begin_nested():
+                    index.create(sync_conn, checkfirst=True)
+            except IntegrityError as e:
+                columns = ", ".join(column.name for column in index.columns)
+                logger.warning(
+                    "Could not create unique index %s on %s (%s); existing duplicate rows "
+                    "violate it, so uniqueness is NOT enforced until they are removed: %s",
+                    index.name, table.name, columns, e.orig,
+                )
+
+
 async def init_db():
     async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        had_recipe_audio = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("recipe_audio"))
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_json_columns)
+        await conn.run_sync(_add_missing_columns)
+        if not had_recipe_audio:
+            await conn.run_sync(_backfill_recipe_audio)
+        await conn.run_sync(_run_once, "normalize_source_urls", _normalize_source_urls)
+        await conn.run_sync(_create_missing_indexes)
+        # Served an admin listing that was never exposed; drop it so inserts stop maintaining it
+        await conn.execute(text("DROP INDEX IF EXISTS ix_recipes_created_at_desc"))
+
 
+async def warm_up_db():
+    """Check out a pooled connection and round-trip once so the first request doesn't pay for it"""
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
@@ -1,10 +1,14 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.config import get_settings
-from app.database import init_db
+from app.database import init_db, warm_up_db
+from app.services.http_client import close_http_client
+from app.services import llm_cache
+from app.services.llm_service import warm_up_tokenizer
 from app.routers import recipes_router, health_router, voices_router, users_router, auth_router
 
 settings = get_settings()
@@ -13,25 +17,37 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    await init_db()
+    if settings.database_auto_create:
+        await init_db()
+    await warm_up_db()
+    warm_up_tokenizer()
+    await llm_cache.sweep()
     yield
     # Shutdown
+    await close_http_client()
 
 
 app = FastAPI(
     title="Foodly API",
     description="AI-powered recipe narration and step-by-step cooking guide",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
 # Mount static directory for audio files
 static_path = Path(__file__).parent / "static"
-static_path.mkdir(parents=True, exist_ok=True)
+if not static_path.is_dir():
+    static_path.mkdir(parents=True, exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
 
 # Configure CORS
-origins = [origin.strip() for origin in settings.cors_origins.split(",")]
+# Keep this the last add_middleware() call: Starlette makes the last-added
+# middleware the outermost one, so preflights and disallowed origins are
+# answered here before any other middleware or route does work.
+# A frozenset makes CORSMiddleware's per-request `origin in allow_origins`
+# check O(1); "*" still enables its allow-all fast path
+origins = frozenset(origin.strip() for origin in settings.cors_origins.split(",") if origin.strip())
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,6 +1,6 @@
 from app.models.user import User
-from app.models.recipe import Recipe
+from app.models.recipe import Recipe, RecipeAudio
 from app.models.user_setting import UserSetting
 
-__all__ = ["User", "Recipe", "UserSetting"]
+__all__ = ["User", "Recipe", "RecipeAudio", "UserSetting"]
 
@@ -1,17 +1,39 @@
 import uuid
-from sqlalchemy import Column, String, Text, DateTime, JSON, ForeignKey, Boolean, Integer
-from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Boolean, Integer, Index, Computed
+from sqlalchemy.orm import deferred
+from sqlalchemy.sql import func, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from app.database import Base
 
 
 class Recipe(Base):
     __tablename__ = "recipes"
+    __table_args__ = (
+        # One recipe per owner and URL, enforced by the database so concurrent
+        # imports can't both insert; also serves the "already saved this URL?" lookups
+        Index("uq_recipes_user_url", "user_id", "source_url", unique=True, postgresql_where=text("user_id IS NOT NULL")),
+        Index("uq_recipes_anon_url", "anonymous_user_id", "source_url", unique=True, postgresql_where=text("anonymous_user_id IS NOT NULL")),
+        # URL lookups not scoped to one owner (get_recipe_by_url without an owner,
+        # get_saved_copy's source_url match across owners)
+        Index("ix_recipes_source_url", "source_url"),
+        # An owner's newest-first recipe list can be read straight off the index;
+        # partial, so rows owned the other way aren't indexed
+        Index("ix_recipes_user_created", "user_id", text("created_at DESC"), postgresql_where=text("user_id IS NOT NULL")),
+        Index("ix_recipes_anon_created", "anonymous_user_id", text("created_at DESC"), postgresql_where=text("anonymous_user_id IS NOT NULL")),
+        # Trigram indexes let ILIKE '%term%' searches use an index scan (needs pg_trgm)
+        Index("ix_recipes_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_recipes_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}),
+        # Full-text search over title + description (search_vec @@ tsquery)
+        Index("ix_recipes_search_vec", "search_vec", postgresql_using="gin"),
+        # Serves tag containment filters (tags @> '["vegan"]')
+        Index("ix_recipes_tags", "tags", postgresql_using="gin", postgresql_ops={"tags": "jsonb_path_ops"}),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     # User ownership - either authenticated user_id or anonymous_user_id (from localStorage)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
-    anonymous_user_id = Column(String(255), nullable=True, index=True)  # For non-logged-in users
+    # Lookups by owner are served by the composite indexes above
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    anonymous_user_id = Column(String(255), nullable=True)  # For non-logged-in users
     is_public = Column(Boolean, default=False)  # For shared recipes
     
     title = Column(String(500), nullable=False, index=True)
@@ -23,9 +45,9 @@ class Recipe(Base):
     cook_time = Column(String(100), nullable=True)
     total_time = Column(String(100), nullable=True)
     servings = Column(String(100), nullable=True)
-    ingredients = Column(JSON, nullable=False, default=list)
-    steps = Column(JSON, nullable=False, default=list)
-    tags = Column(JSON, nullable=True, default=list)
+    ingredients = Column(JSONB, nullable=False, default=list)
+    steps = Column(JSONB, nullable=False, default=list)
+    tags = Column(JSONB, nullable=True, default=list)
     raw_content = Column(Text, nullable=True)
     intro_text = Column(Text, nullable=True)
     outro_text = Column(Text, nullable=True)
@@ -34,7 +56,27 @@ class Recipe(Base):
     ingredients_audio_url = Column(String(2000), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Maintained by Postgres; deferred so loading a Recipe doesn't fetch it, and
+    # raising on access since a lazy load can't run under the async session
+    search_vec = deferred(
+        Column(
+            TSVECTOR,
+            Computed("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))", persisted=True),
+        ),
+        raiseload=True,
+    )
     
     def __repr__(self):
         return f"<Recipe(id={self.id}, title='{self.title}')>"
 
+
+class RecipeAudio(Base):
+    """One row per narration audio URL a recipe references, so shared files can be found by index."""
+    __tablename__ = "recipe_audio"
+    
+    recipe_id = Column(UUID(as_uuid=True), ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    audio_url = Column(String(2000), primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f"<RecipeAudio(recipe_id={self.recipe_id}, audio_url='{self.audio_url}')>"
+
@@ -6,12 +6,60 @@ from app.schemas.auth import (
     UserCreate, UserLogin, UserResponse, TokenResponse,
     TokenRefreshRequest, PasswordChangeRequest
 )
-from app.services.auth_service import AuthService
+from app.services.auth_service import get_auth_service
 from app.models.user import User
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
 
+def _validate_password(password: str) -> None:
+    """Enforce the password policy, raising 400 on the first rule that fails"""
+    if len(password) < 8:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Password must be at least 8 characters"
+        )
+    
+    # Single pass over the password instead of one any() scan per rule
+    has_upper = has_lower = has_digit = False
+    for c in password:
+        if c.isupper():
+            has_upper = True
+        elif c.islower():
+            has_lower = True
+        elif c.isdigit():
+            has_digit = True
+        else:
+            continue
+        if has_upper and has_lower and has_digit:
+            return
+    
+    if not has_upper:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Password must contain at least one uppercase letter"
+        )
+    if not has_lower:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Password must contain at least one lowercase letter"
+        )
+    if not has_digit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Password must contain at least one number"
+        )
+
+
+def _token_response(user: User, access_token: str, refresh_token: str) -> TokenResponse:
+    """Build the token payload returned by signup, login and refresh"""
+    return TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        user=UserResponse.model_validate(user)
+    )
+
+
 async def get_current_user(
     authorization: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
@@ -27,8 +75,7 @@ async def get_current_user(
     except ValueError:
         return None
     
-    auth_service = AuthService(db)
-    return await auth_service.verify_token(token)
+    return await get_auth_service().verify_token(db, token)
 
 
 async def require_auth(
@@ -49,10 +96,10 @@ async def require_auth(
 @router.post("/signup", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
 async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
-    auth_service = AuthService(db)
+    auth_service = get_auth_service()
     
     # Check if user already exists
-    existing_user = await auth_service.get_user_by_email(user_data.email)
+    existing_user = await auth_service.get_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -60,83 +107,44 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         )
     
     # Validate password strength
-    password = user_data.password
-    if len(password) < 8:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must be at least 8 characters"
-        )
-    if not any(c.isupper() for c in password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must contain at least one uppercase letter"
-        )
-    if not any(c.islower() for c in password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must contain at least one lowercase letter"
-        )
-    if not any(c.isdigit() for c in password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must contain at least one number"
-        )
+    _validate_password(user_data.password)
     
     # Create user
-    user = await auth_service.create_user(user_data)
+    user = await auth_service.create_user(db, user_data)
     
     # Generate tokens
-    access_token, refresh_token = auth_service.create_tokens(user)
-    
-    return TokenResponse(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        user=UserResponse.model_validate(user)
-    )
+    return _token_response(user, *auth_service.create_tokens(user))
 
 
 @router.post("/login", response_model=TokenResponse)
 async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login with email and password"""
-    auth_service = AuthService(db)
+    auth_service = get_auth_service()
     
-    user = await auth_service.authenticate(credentials.email, credentials.password)
+    user = await auth_service.authenticate(db, credentials.email, credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
-    access_token, refresh_token = auth_service.create_tokens(user)
-    
-    return TokenResponse(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        user=UserResponse.model_validate(user)
-    )
+    return _token_response(user, *auth_service.create_tokens(user))
 
 
 @router.post("/refresh", response_model=TokenResponse)
 async def refresh_token(request: TokenRefreshRequest, db: AsyncSession = Depends(get_db)):
     """Refresh access token using refresh token"""
-    auth_service = AuthService(db)
+    auth_service = get_auth_service()
     
-    result = await auth_service.refresh_access_token(request.refresh_token)
+    result = await auth_service.refresh_tokens(db, request.refresh_token)
     if not result:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired refresh token"
         )
     
-    new_access_token, user = result
-    # Also generate new refresh token for rotation
-    _, new_refresh_token = auth_service.create_tokens(user)
-    
-    return TokenResponse(
-        access_token=new_access_token,
-        refresh_token=new_refresh_token,
-        user=UserResponse.model_validate(user)
-    )
+    new_access_token, new_refresh_token, user = result
+    return _token_response(user, new_access_token, new_refresh_token)
 
 
 @router.get("/me", response_model=UserResponse)
@@ -152,39 +160,19 @@ async def change_password(
     db: AsyncSession = Depends(get_db)
 ):
     """Change current user's password"""
-    auth_service = AuthService(db)
+    auth_service = get_auth_service()
     
     # Verify current password
-    if not auth_service.hasher.verify(request.current_password, user.hashed_password):
+    if not await auth_service.verify_password(request.current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Validate new password
-    password = request.new_password
-    if len(password) < 8:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must be at least 8 characters"
-        )
-    if not any(c.isupper() for c in password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must contain at least one uppercase letter"
-        )
-    if not any(c.islower() for c in password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must contain at least one lowercase letter"
-        )
-    if not any(c.isdigit() for c in password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password must contain at least one number"
-        )
+    _validate_password(request.new_password)
     
-    await auth_service.change_password(user, request.new_password)
+    await auth_service.change_password(db, user, request.new_password)
     
     return {"message": "Password changed successfully"}
 
@@ -1,29 +1,38 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter
 from sqlalchemy import text
-from app.database import get_db
+from cachetools import TTLCache
+from app.database import engine
 from app.config import get_settings
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 settings = get_settings()
 
+# Probe bursts share one result per second instead of one DB round-trip each
+_health_cache: TTLCache = TTLCache(maxsize=1, ttl=1)
+
 
 @router.get("")
-async def health_check(db: AsyncSession = Depends(get_db)):
+async def health_check():
     """Health check endpoint."""
+    cached = _health_cache.get("status")
+    if cached:
+        return cached
+    
     health_status = {
         "status": "healthy",
         "database": "unknown",
         "llm_provider": settings.llm_provider
     }
     
-    # Check database connection
+    # Check database connection on a bare pooled connection; no session or
+    # request transaction is needed for SELECT 1
     try:
-        await db.execute(text("SELECT 1"))
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         health_status["database"] = "connected"
     except Exception as e:
         health_status["database"] = f"error: {str(e)}"
         health_status["status"] = "degraded"
     
+    _health_cache["status"] = health_status
     return health_status
-
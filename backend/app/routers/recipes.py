@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Header
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+from uuid import UUID
 from app.database import get_db
 from app.schemas.recipe import (
     RecipeCreate,
@@ -8,29 +11,30 @@ from app.schemas.recipe import (
     RecipeListResponse,
     RecipeProcessRequest,
     RecipeSaveRequest,
-    IngredientSchema,
-    StepSchema,
     ShoppingListResponse,
     ShoppingItem,
     ProductLink
 )
-from app.services.recipe_service import RecipeService
+from app.services.recipe_service import RecipeService, normalize_recipe_url
 from app.services.scraper_service import ScraperService, get_scraper_service
 from app.services.llm_service import LLMService, get_llm_service
 from app.services.user_settings_service import UserSettingsService
-from app.services.auth_service import AuthService
+from app.services.auth_service import get_auth_service
 from app.services.shopping_service import ShoppingService, get_shopping_service
-from app.models.user import User
 from app.services.tts_service import get_tts_service
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/recipes", tags=["recipes"])
 
 
-async def get_optional_user(
-    authorization: Optional[str] = Header(None),
-    db: AsyncSession = Depends(get_db)
-) -> Optional[User]:
-    """Extract user from Authorization header if present"""
+async def get_optional_user_id(
+    authorization: Optional[str] = Header(None)
+) -> Optional[int]:
+    """Extract the user id from the Authorization header if present.
+    
+    Recipe endpoints only need the id, so the users row is not loaded.
+    """
     if not authorization:
         return None
     
@@ -41,8 +45,39 @@ async def get_optional_user(
     except ValueError:
         return None
     
-    auth_service = AuthService(db)
-    return await auth_service.verify_token(token)
+    return get_auth_service().verify_token_light(token)
+
+
+async def get_existing_user_id(
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    db: AsyncSession = Depends(get_db)
+) -> Optional[int]:
+    """Like get_optional_user_id, but None if the user no longer exists.
+    
+    For endpoints that store the id: a token that outlives its user is treated
+    as anonymous instead of failing on the users foreign key.
+    """
+    if user_id is None or not await get_auth_service().user_exists(db, user_id):
+        return None
+    return user_id
+
+
+def _recipe_response(recipe) -> Response:
+    """Validate a recipe once and encode it with pydantic-core (see _list_response)"""
+    return Response(
+        content=RecipeResponse.model_validate(recipe).model_dump_json(),
+        media_type="application/json"
+    )
+
+
+def _list_response(recipes, total: int) -> Response:
+    """Validate a recipe page once and encode it with pydantic-core.
+    
+    Returning the model would make FastAPI dump it to dicts, validate it again
+    against response_model and then encode it.
+    """
+    page = RecipeListResponse(recipes=recipes, total=total)
+    return Response(content=page.model_dump_json(), media_type="application/json")
 
 
 @router.post("/process", response_model=RecipeResponse)
@@ -51,7 +86,7 @@ async def process_recipe(
     db: AsyncSession = Depends(get_db),
     scraper: ScraperService = Depends(get_scraper_service),
     llm: LLMService = Depends(get_llm_service),
-    user: Optional[User] = Depends(get_optional_user)
+    auth_user_id: Optional[int] = Depends(get_existing_user_id)
 ):
     """Process a recipe URL (website or YouTube) and save it."""
     recipe_service = RecipeService(db)
@@ -59,78 +94,94 @@ async def process_recipe(
     tts_service = get_tts_service()
     
     # Determine user info
-    user_id = user.id if user else request.user_id
-    anonymous_user_id = request.anonymous_user_id if not user else None
+    user_id = auth_user_id or request.user_id
+    anonymous_user_id = request.anonymous_user_id if not auth_user_id else None
     
-    # Get voice preference
-    voice_user_id = str(user_id) if user_id else request.anonymous_user_id
-    voice_id = await user_settings.get_user_voice(voice_user_id) if voice_user_id else None
+    url = normalize_recipe_url(request.url)
     
     # Check if recipe already exists for this user
     existing = await recipe_service.get_recipe_by_url(
-        request.url,
+        url,
         user_id=user_id,
         anonymous_user_id=anonymous_user_id
     )
     if existing:
-        return existing
+        return _recipe_response(existing)
+    
+    # Get voice preference (only needed once we know we have work to do; this
+    # may create the settings row, so it is not run alongside the lookup above)
+    voice_user_id = str(user_id) if user_id else request.anonymous_user_id
+    voice_id = await user_settings.get_user_voice(voice_user_id) if voice_user_id else None
+    
+    # Reuse another user's parse of the same URL (same voice) instead of
+    # scraping and calling the LLM again
+    cached = await recipe_service.copy_parsed_recipe(
+        url,
+        voice_id,
+        user_id=user_id,
+        anonymous_user_id=anonymous_user_id
+    )
+    if cached:
+        return _recipe_response(cached)
     
-    # Collect audio URLs so we can clean them up on failure
+    # Audio URLs in a parsed recipe, walked only if we need to clean them up
     def collect_audio_urls(parsed: dict):
-        urls = []
-        for key in ("intro_audio_url", "outro_audio_url", "ingredients_audio_url"):
-            if parsed.get(key):
-                urls.append(parsed[key])
-        for step in parsed.get("steps", []):
-            if isinstance(step, dict) and step.get("audio_url"):
-                urls.append(step["audio_url"])
-        return urls
+        keys = ("intro_audio_url", "outro_audio_url", "ingredients_audio_url")
+        yield from filter(None, (parsed.get(key) for key in keys))
+        yield from (
+            step["audio_url"]
+            for step in parsed.get("steps", ())
+            if isinstance(step, dict) and step.get("audio_url")
+        )
 
+    parsed_recipe = None
     try:
         # Scrape the content
         scraped_data = await scraper.scrape(request.url)
         
-        # Clean content length for debug logging
+        # Lazy %-style args: nothing is formatted unless the level is enabled
         content_len = len(scraped_data.get('content', ''))
-        print(f"[DEBUG] Scraped Content Length: {content_len} chars")
+        logger.debug("Scraped content length: %d chars", content_len)
         if content_len > 0:
-            print(f"[DEBUG] Scraped Content Preview:\n{scraped_data['content'][:500]}...\n")
+            logger.debug("Scraped content preview:\n%.500s...", scraped_data['content'])
         else:
-            print(f"[DEBUG] WARNING: Scraped content is empty!")
+            logger.warning("Scraped content is empty for %s", request.url)
+        
+        # Keep only the stored prefix and hand the full page text to the LLM
+        # without holding our own reference across the (slow) LLM call
+        raw_content = scraped_data["content"][:5000]
         
         # Parse with LLM
         parsed_recipe = await llm.parse_recipe(
-            scraped_data["content"],
+            scraped_data.pop("content"),
             scraped_data["source_type"],
             voice=voice_id
         )
         
-        # Create ingredient schemas
-        ingredients = []
-        for ing in parsed_recipe.get("ingredients", []):
-            if isinstance(ing, dict):
-                ingredients.append(IngredientSchema(
-                    name=ing.get("name", "Unknown"),
-                    amount=ing.get("amount"),
-                    unit=ing.get("unit"),
-                    notes=ing.get("notes")
-                ))
-            elif isinstance(ing, str):
-                ingredients.append(IngredientSchema(name=ing))
+        # Ingredient and step dicts are validated once, by RecipeCreate below
+        ingredients = [
+            {
+                "name": ing.get("name", "Unknown"),
+                "amount": ing.get("amount"),
+                "unit": ing.get("unit"),
+                "notes": ing.get("notes")
+            } if isinstance(ing, dict) else {"name": ing}
+            for ing in parsed_recipe.get("ingredients", [])
+            if isinstance(ing, (dict, str))
+        ]
         
-        # Create step schemas (including audio_url from TTS generation)
-        steps = []
-        for i, step in enumerate(parsed_recipe.get("steps", []), 1):
-            if isinstance(step, dict):
-                steps.append(StepSchema(
-                    number=step.get("number", i),
-                    instruction=step.get("instruction", str(step)),
-                    duration=step.get("duration"),
-                    tips=step.get("tips"),
-                    audio_url=step.get("audio_url")  # Include generated audio URL
-                ))
-            elif isinstance(step, str):
-                steps.append(StepSchema(number=i, instruction=step))
+        # Steps carry the audio_url from TTS generation
+        steps = [
+            {
+                "number": step.get("number", i),
+                "instruction": step.get("instruction", str(step)),
+                "duration": step.get("duration"),
+                "tips": step.get("tips"),
+                "audio_url": step.get("audio_url")
+            } if isinstance(step, dict) else {"number": i, "instruction": step}
+            for i, step in enumerate(parsed_recipe.get("steps", []), 1)
+            if isinstance(step, (dict, str))
+        ]
         
         # Use scraped title if LLM didn't provide one
         title = parsed_recipe.get("title") or scraped_data.get("title") or "Untitled Recipe"
@@ -138,7 +189,7 @@ async def process_recipe(
         # Create recipe
         recipe_data = RecipeCreate(
             title=title,
-            source_url=request.url,
+            source_url=url,
             source_type=scraped_data["source_type"],
             description=parsed_recipe.get("description"),
             image_url=scraped_data.get("image_url"),
@@ -149,15 +200,13 @@ async def process_recipe(
             ingredients=ingredients,
             steps=steps,
             tags=parsed_recipe.get("tags", []),
-            raw_content=scraped_data["content"][:5000],  # Store first 5000 chars
+            raw_content=raw_content,  # First 5000 chars of the scraped page
             intro_text=parsed_recipe.get("intro_text"),
             outro_text=parsed_recipe.get("outro_text"),
             intro_audio_url=parsed_recipe.get("intro_audio_url"),
             outro_audio_url=parsed_recipe.get("outro_audio_url"),
             ingredients_audio_url=parsed_recipe.get("ingredients_audio_url")
         )
-        
-        audio_urls = collect_audio_urls(parsed_recipe)
 
         # Use a transaction to ensure we don't keep partial data
         tx_ctx = db.begin_nested() if db.in_transaction() else db.begin()
@@ -168,16 +217,31 @@ async def process_recipe(
                 anonymous_user_id=anonymous_user_id,
                 commit=False  # commit handled by context manager
             )
-        return recipe
+        if recipe is None:
+            # A concurrent import of this URL for the same owner saved first;
+            # drop our audio and return that recipe instead
+            await asyncio.gather(
+                *(tts_service.delete_audio(audio_url) for audio_url in collect_audio_urls(parsed_recipe)),
+                return_exceptions=True
+            )
+            recipe = await recipe_service.get_recipe_by_url(
+                url,
+                user_id=user_id,
+                anonymous_user_id=anonymous_user_id
+            )
+        else:
+            recipe_service.remember_parsed_recipe(url, voice_id, recipe.id)
         
     except Exception as e:
         # Clean up any generated audio if something failed
-        try:
-            for url in locals().get("audio_urls", []):
-                tts_service.delete_audio(url)
-        except Exception:
-            pass
+        if parsed_recipe:
+            await asyncio.gather(
+                *(tts_service.delete_audio(audio_url) for audio_url in collect_audio_urls(parsed_recipe)),
+                return_exceptions=True
+            )
         raise HTTPException(status_code=500, detail=f"Failed to process recipe: {str(e)}")
+    
+    return _recipe_response(recipe)
 
 
 @router.get("", response_model=RecipeListResponse)
@@ -185,8 +249,9 @@ async def get_recipes(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     anonymous_user_id: Optional[str] = Query(None, description="Anonymous user ID from localStorage"),
+    tag: Optional[str] = Query(None, description="Only return recipes with this tag"),
     db: AsyncSession = Depends(get_db),
-    user: Optional[User] = Depends(get_optional_user)
+    user_id: Optional[int] = Depends(get_optional_user_id)
 ):
     """Get recipes for the current user. Max limit per request is 10."""
     if limit > 10:
@@ -194,20 +259,14 @@ async def get_recipes(
 
     recipe_service = RecipeService(db)
     
-    # Get user-specific recipes
-    user_id = user.id if user else None
-    
-    recipes = await recipe_service.get_user_recipes(
+    recipes, total = await recipe_service.get_user_recipes_page(
         user_id=user_id,
-        anonymous_user_id=anonymous_user_id if not user else None,
+        anonymous_user_id=anonymous_user_id if not user_id else None,
         skip=skip,
-        limit=limit
+        limit=limit,
+        tag=tag
     )
-    total = await recipe_service.count_user_recipes(
-        user_id=user_id,
-        anonymous_user_id=anonymous_user_id if not user else None
-    )
-    return RecipeListResponse(recipes=recipes, total=total)
+    return _list_response(recipes, total)
 
 
 @router.get("/search", response_model=RecipeListResponse)
@@ -217,45 +276,44 @@ async def search_recipes(
     limit: int = Query(50, ge=1, le=100),
     anonymous_user_id: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    user: Optional[User] = Depends(get_optional_user)
+    user_id: Optional[int] = Depends(get_optional_user_id)
 ):
     """Search recipes by title or description for the current user."""
     recipe_service = RecipeService(db)
     
-    user_id = user.id if user else None
-    
-    recipes = await recipe_service.search_user_recipes(
+    recipes, total = await recipe_service.search_user_recipes_page(
         q,
         user_id=user_id,
-        anonymous_user_id=anonymous_user_id if not user else None,
+        anonymous_user_id=anonymous_user_id if not user_id else None,
         skip=skip,
         limit=limit
     )
-    return RecipeListResponse(recipes=recipes, total=len(recipes))
+    return _list_response(recipes, total)
 
 
 @router.get("/{recipe_id}", response_model=RecipeResponse)
 async def get_recipe(
-    recipe_id: str,
+    recipe_id: UUID,
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific recipe by ID."""
     recipe_service = RecipeService(db)
-    recipe = await recipe_service.get_recipe(recipe_id)
-    if not recipe:
+    payload = await recipe_service.get_recipe_json(recipe_id)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
-    return recipe
+    # Postgres already produced the RecipeResponse JSON; send it as-is
+    return Response(content=payload, media_type="application/json")
 
 
 @router.get("/{recipe_id}/shopping", response_model=ShoppingListResponse)
 async def get_shopping_links(
-    recipe_id: str,
+    recipe_id: UUID,
     country: str = Query("US", min_length=2),
     db: AsyncSession = Depends(get_db),
     shopping_service: ShoppingService = Depends(get_shopping_service)
 ):
     """Get shopping links for recipe ingredients."""
-    print(f"[DEBUG] Shopping request for recipe {recipe_id}, country={country}")
+    logger.debug("Shopping request for recipe %s, country=%s", recipe_id, country)
     recipe_service = RecipeService(db)
     recipe = await recipe_service.get_recipe(recipe_id)
     if not recipe:
@@ -271,7 +329,7 @@ async def get_shopping_links(
         elif isinstance(ing, str):
              ingredients.append(ing)
     
-    print(f"[DEBUG] Found {len(ingredients)} ingredients to generate links for")
+    logger.debug("Found %d ingredients to generate links for", len(ingredients))
 
     # Generate product links for each ingredient
     # No external API calls - just generates direct links to grocery sites
@@ -283,22 +341,20 @@ async def get_shopping_links(
             products=[ProductLink(**p) for p in products]
         ))
     
-    print(f"[DEBUG] Generated shopping links for {len(items)} items")
+    logger.debug("Generated shopping links for %d items", len(items))
     return ShoppingListResponse(items=items)
 
 
 @router.delete("/{recipe_id}")
 async def delete_recipe(
-    recipe_id: str,
+    recipe_id: UUID,
     anonymous_user_id: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    user: Optional[User] = Depends(get_optional_user)
+    user_id: Optional[int] = Depends(get_optional_user_id)
 ):
     """Delete a recipe."""
     recipe_service = RecipeService(db)
     
-    user_id = user.id if user else None
-
     # Require identity to delete recipes
     if not user_id and not anonymous_user_id:
         raise HTTPException(
@@ -309,7 +365,7 @@ async def delete_recipe(
     success = await recipe_service.delete_recipe(
         recipe_id,
         user_id=user_id,
-        anonymous_user_id=anonymous_user_id if not user else None
+        anonymous_user_id=anonymous_user_id if not user_id else None
     )
     if not success:
         raise HTTPException(status_code=404, detail="Recipe not found or not owned by user")
@@ -321,13 +377,12 @@ async def save_shared_recipe(
     request: RecipeSaveRequest,
     anonymous_user_id: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    user: Optional[User] = Depends(get_optional_user)
+    user_id: Optional[int] = Depends(get_existing_user_id)
 ):
     """Save a shared recipe to user's profile."""
     recipe_service = RecipeService(db)
     
-    user_id = user.id if user else None
-    anon_id = anonymous_user_id if not user else None
+    anon_id = anonymous_user_id if not user_id else None
     
     if not user_id and not anon_id:
         raise HTTPException(
@@ -335,21 +390,16 @@ async def save_shared_recipe(
             detail="User identification required to save recipe"
         )
     
-    # Check if recipe exists
-    original = await recipe_service.get_recipe(request.recipe_id)
-    if not original:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-    
     # Check if user already has this recipe (by URL)
-    existing = await recipe_service.get_recipe_by_url(
-        original.source_url,
+    existing = await recipe_service.get_saved_copy(
+        request.recipe_id,
         user_id=user_id,
         anonymous_user_id=anon_id
     )
     if existing:
-        return existing  # Already saved
+        return _recipe_response(existing)  # Already saved
     
-    # Copy recipe to user's profile
+    # Copy recipe to user's profile (None means the original doesn't exist)
     new_recipe = await recipe_service.copy_recipe_to_user(
         request.recipe_id,
         user_id=user_id,
@@ -357,25 +407,25 @@ async def save_shared_recipe(
     )
     
     if not new_recipe:
-        raise HTTPException(status_code=500, detail="Failed to save recipe")
+        raise HTTPException(status_code=404, detail="Recipe not found")
     
-    return new_recipe
+    return _recipe_response(new_recipe)
 
 
 @router.post("/migrate")
 async def migrate_anonymous_recipes(
     anonymous_user_id: str = Query(..., description="Anonymous user ID to migrate from"),
     db: AsyncSession = Depends(get_db),
-    user: Optional[User] = Depends(get_optional_user)
+    user_id: Optional[int] = Depends(get_existing_user_id)
 ):
     """Migrate recipes from anonymous user to authenticated user."""
-    if not user:
+    if not user_id:
         raise HTTPException(
             status_code=401,
             detail="Authentication required to migrate recipes"
         )
     
     recipe_service = RecipeService(db)
-    count = await recipe_service.migrate_anonymous_recipes(anonymous_user_id, user.id)
+    count = await recipe_service.migrate_anonymous_recipes(anonymous_user_id, user_id)
     
     return {"message": f"Successfully migrated {count} recipes", "count": count}
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.schemas.voice import VoiceListResponse, UserVoiceResponse, UserVoiceUpdateRequest
@@ -8,11 +10,24 @@ from app.services.user_settings_service import UserSettingsService
 voices_router = APIRouter(prefix="/api/voices", tags=["voices"])
 users_router = APIRouter(prefix="/api/users", tags=["users"])
 
+# The voice catalog only changes with a deploy, so the encoded list and its
+# ETag are reused for an hour instead of being rebuilt on every client boot
+_voices_cache: TTLCache = TTLCache(maxsize=1, ttl=3600)
+
 
 @voices_router.get("", response_model=VoiceListResponse)
-async def list_available_voices(tts: TTSService = Depends(get_tts_service)):
-    voices = await tts.get_available_voices(include_samples=True)
-    return VoiceListResponse(voices=voices)
+async def list_available_voices(request: Request, tts: TTSService = Depends(get_tts_service)):
+    cached = _voices_cache.get("voices")
+    if cached is None:
+        voices = await tts.get_available_voices(include_samples=True)
+        body = VoiceListResponse(voices=voices).model_dump_json().encode()
+        cached = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        _voices_cache["voices"] = cached
+    
+    body, etag = cached
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @users_router.get("/{user_id}/voice", response_model=UserVoiceResponse)
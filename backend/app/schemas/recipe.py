@@ -1,8 +1,13 @@
-from pydantic import BaseModel, HttpUrl
+import re
+from pydantic import BaseModel, ConfigDict, field_validator
 from typing import Optional, List, Dict
+from urllib.parse import urlsplit
 from uuid import UUID
 from datetime import datetime
 
+# Submitted recipe URLs must be http(s) with a host; checked before any DB or network work
+_RECIPE_URL_RE = re.compile(r"^https?://[^\s/?#]+", re.IGNORECASE)
+
 
 class IngredientSchema(BaseModel):
     name: str
@@ -24,6 +29,17 @@ class RecipeProcessRequest(BaseModel):
     user_id: Optional[int] = None  # Authenticated user ID
     anonymous_user_id: Optional[str] = None  # Anonymous user ID from localStorage
 
+    @field_validator("url")
+    @classmethod
+    def check_url(cls, value: str) -> str:
+        value = value.strip()
+        if not _RECIPE_URL_RE.match(value):
+            raise ValueError("Recipe URL must be an http(s) link")
+        # Raises ValueError for hosts urlsplit can't parse (e.g. "http://[bad"),
+        # so normalize_recipe_url can't fail later
+        urlsplit(value)
+        return value
+
 
 class RecipeCreate(BaseModel):
     title: str
@@ -73,8 +89,7 @@ class RecipeResponse(BaseModel):
     anonymous_user_id: Optional[str] = None
     is_public: bool = False
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class RecipeSaveRequest(BaseModel):
@@ -1,11 +1,15 @@
+import asyncio
 import hashlib
 import hmac
-import secrets
+import os
 import base64
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
-from datetime import datetime, timedelta
+from argon2 import PasswordHasher as Argon2Hasher
+from argon2.exceptions import InvalidHashError, VerificationError
+import orjson
+from cachetools import TTLCache
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.user import User
@@ -14,31 +18,52 @@ from app.config import get_settings
 
 settings = get_settings()
 
+# sha256 of verified bearer tokens -> (user_id, exp), so a token presented
+# again within the TTL skips signature verification and payload decoding
+# (digests rather than the tokens themselves are kept in memory)
+_verified_tokens: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+
+# Password hashing is CPU-bound (argon2 and pbkdf2_hmac both release the GIL),
+# so it runs on its own pool sized to the CPU count instead of on the event loop
+_hash_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="password-hash")
+
 
 class PasswordHasher:
-    """Simple but secure password hashing using PBKDF2-SHA256"""
+    """Password hashing with argon2id; legacy PBKDF2-SHA256 hashes still verify"""
     
+    # Legacy PBKDF2 format, kept so existing users can log in and be rehashed
     ITERATIONS = 390000  # OWASP recommendation for PBKDF2-SHA256
-    SALT_LENGTH = 32
-    KEY_LENGTH = 32
+    
+    _argon2 = Argon2Hasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
     
     @classmethod
     def hash(cls, password: str) -> str:
-        """Hash a password with a random salt"""
-        salt = secrets.token_bytes(cls.SALT_LENGTH)
-        key = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            salt,
-            cls.ITERATIONS,
-            dklen=cls.KEY_LENGTH
-        )
-        # Format: iterations$salt$key (all base64 encoded)
-        return f"{cls.ITERATIONS}${base64.b64encode(salt).decode()}${base64.b64encode(key).decode()}"
+        """Hash a password with argon2id (random salt, encoded in the hash)"""
+        return cls._argon2.hash(password)
     
     @classmethod
     def verify(cls, password: str, hashed: str) -> bool:
-        """Verify a password against a hash"""
+        """Verify a password against an argon2id or legacy PBKDF2 hash"""
+        if hashed.startswith("$argon2"):
+            try:
+                return cls._argon2.verify(hashed, password)
+            except (VerificationError, InvalidHashError):
+                return False
+        return cls._verify_pbkdf2(password, hashed)
+    
+    @classmethod
+    def needs_rehash(cls, hashed: str) -> bool:
+        """Whether a hash uses the legacy format or outdated argon2 parameters"""
+        if not hashed.startswith("$argon2"):
+            return True
+        try:
+            return cls._argon2.check_needs_rehash(hashed)
+        except InvalidHashError:
+            return True
+    
+    @classmethod
+    def _verify_pbkdf2(cls, password: str, hashed: str) -> bool:
+        """Verify against the legacy iterations$salt$key format"""
         try:
             iterations_str, salt_b64, key_b64 = hashed.split('$')
             iterations = int(iterations_str)
@@ -64,6 +89,18 @@ class JWTHandler:
     ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
     REFRESH_TOKEN_EXPIRE_DAYS = 30
     
+    # The header never changes, so it is encoded once
+    _HEADER_B64 = base64.urlsafe_b64encode(b'{"alg": "HS256", "typ": "JWT"}').rstrip(b'=').decode('utf-8')
+    
+    # Keyed once; _sign() copies it so the HMAC key setup isn't redone per token
+    _SIGNER = hmac.new(SECRET_KEY.encode(), digestmod=hashlib.sha256)
+    
+    @classmethod
+    def _sign(cls, data: bytes) -> bytes:
+        signer = cls._SIGNER.copy()
+        signer.update(data)
+        return signer.digest()
+    
     @classmethod
     def _base64url_encode(cls, data: bytes) -> str:
         return base64.urlsafe_b64encode(data).rstrip(b'=').decode('utf-8')
@@ -78,28 +115,24 @@ class JWTHandler:
     @classmethod
     def create_token(cls, user_id: int, token_type: str = "access") -> str:
         """Create a JWT token"""
+        now = int(time.time())
         if token_type == "access":
-            exp = datetime.utcnow() + timedelta(minutes=cls.ACCESS_TOKEN_EXPIRE_MINUTES)
+            exp = now + cls.ACCESS_TOKEN_EXPIRE_MINUTES * 60
         else:
-            exp = datetime.utcnow() + timedelta(days=cls.REFRESH_TOKEN_EXPIRE_DAYS)
+            exp = now + cls.REFRESH_TOKEN_EXPIRE_DAYS * 86400
         
-        header = {"alg": "HS256", "typ": "JWT"}
         payload = {
             "sub": str(user_id),
-            "exp": int(exp.timestamp()),
+            "exp": exp,
             "type": token_type,
-            "iat": int(datetime.utcnow().timestamp())
+            "iat": now
         }
         
-        header_b64 = cls._base64url_encode(json.dumps(header).encode())
-        payload_b64 = cls._base64url_encode(json.dumps(payload).encode())
+        header_b64 = cls._HEADER_B64
+        payload_b64 = cls._base64url_encode(orjson.dumps(payload))
         
         signature_input = f"{header_b64}.{payload_b64}".encode()
-        signature = hmac.new(
-            cls.SECRET_KEY.encode(),
-            signature_input,
-            hashlib.sha256
-        ).digest()
+        signature = cls._sign(signature_input)
         signature_b64 = cls._base64url_encode(signature)
         
         return f"{header_b64}.{payload_b64}.{signature_b64}"
@@ -116,18 +149,14 @@ class JWTHandler:
             
             # Verify signature
             signature_input = f"{header_b64}.{payload_b64}".encode()
-            expected_signature = hmac.new(
-                cls.SECRET_KEY.encode(),
-                signature_input,
-                hashlib.sha256
-            ).digest()
+            expected_signature = cls._sign(signature_input)
             actual_signature = cls._base64url_decode(signature_b64)
             
             if not hmac.compare_digest(expected_signature, actual_signature):
                 return None
             
             # Decode payload
-            payload = json.loads(cls._base64url_decode(payload_b64))
+            payload = orjson.loads(cls._base64url_decode(payload_b64))
             
             # Check expiration
             if payload.get('exp', 0) < time.time():
@@ -146,81 +175,135 @@ class JWTHandler:
 
 
 class AuthService:
-    def __init__(self, db: AsyncSession):
-        self.db = db
+    """Stateless auth operations; the request's session is passed to each DB-backed call"""
+    
+    def __init__(self):
         self.hasher = PasswordHasher()
         self.jwt = JWTHandler()
     
-    async def create_user(self, user_data: UserCreate) -> User:
+    async def hash_password(self, password: str) -> str:
+        """Hash a password off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, self.hasher.hash, password)
+    
+    async def verify_password(self, password: str, hashed: str) -> bool:
+        """Verify a password off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, self.hasher.verify, password, hashed)
+    
+    async def create_user(self, db: AsyncSession, user_data: UserCreate) -> User:
         """Create a new user"""
-        hashed_password = self.hasher.hash(user_data.password)
+        hashed_password = await self.hash_password(user_data.password)
         
         user = User(
             email=user_data.email.lower(),
             hashed_password=hashed_password
         )
         
-        self.db.add(user)
-        await self.db.commit()
-        await self.db.refresh(user)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
         
         return user
     
-    async def get_user_by_email(self, email: str) -> Optional[User]:
+    async def get_user_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
         """Get user by email"""
-        result = await self.db.execute(
+        result = await db.execute(
             select(User).where(User.email == email.lower())
         )
         return result.scalar_one_or_none()
     
-    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+    async def get_user_by_id(self, db: AsyncSession, user_id: int) -> Optional[User]:
         """Get user by ID"""
-        result = await self.db.execute(
+        result = await db.execute(
             select(User).where(User.id == user_id)
         )
         return result.scalar_one_or_none()
     
-    async def authenticate(self, email: str, password: str) -> Optional[User]:
+    async def user_exists(self, db: AsyncSession, user_id: int) -> bool:
+        """Whether a users row with this id exists (primary key lookup, nothing loaded)"""
+        result = await db.execute(
+            select(User.id).where(User.id == user_id)
+        )
+        return result.scalar_one_or_none() is not None
+    
+    async def authenticate(self, db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Authenticate a user by email and password"""
-        user = await self.get_user_by_email(email)
+        user = await self.get_user_by_email(db, email)
         if not user:
             return None
-        if not self.hasher.verify(password, user.hashed_password):
+        if not await self.verify_password(password, user.hashed_password):
             return None
         if not user.is_active:
             return None
+        
+        # Migrate legacy PBKDF2 hashes to argon2id while we have the plaintext
+        if self.hasher.needs_rehash(user.hashed_password):
+            user.hashed_password = await self.hash_password(password)
+            await db.commit()
         return user
     
-    async def change_password(self, user: User, new_password: str) -> bool:
+    async def change_password(self, db: AsyncSession, user: User, new_password: str) -> bool:
         """Change user's password"""
-        user.hashed_password = self.hasher.hash(new_password)
-        await self.db.commit()
+        user.hashed_password = await self.hash_password(new_password)
+        await db.commit()
         return True
     
     def create_tokens(self, user: User) -> Tuple[str, str]:
         """Create access and refresh tokens for a user"""
         return self.jwt.create_token_pair(user.id)
     
-    async def verify_token(self, token: str) -> Optional[User]:
-        """Verify a token and return the user"""
+    def verify_token_light(self, token: str) -> Optional[int]:
+        """Verify a token and return its user id, without loading the user"""
+        key = hashlib.sha256(token.encode()).digest()
+        cached = _verified_tokens.get(key)
+        if cached and cached[1] >= time.time():
+            return cached[0]
+        
         payload = self.jwt.verify_token(token)
         if not payload:
             return None
         
         user_id = int(payload.get('sub', 0))
-        return await self.get_user_by_id(user_id)
+        _verified_tokens[key] = (user_id, payload.get('exp', 0))
+        return user_id
+    
+    async def verify_token(self, db: AsyncSession, token: str) -> Optional[User]:
+        """Verify a token and return the user"""
+        user_id = self.verify_token_light(token)
+        if user_id is None:
+            return None
+        
+        # The user row is still loaded so handlers get a live, session-bound User
+        return await self.get_user_by_id(db, user_id)
     
-    async def refresh_access_token(self, refresh_token: str) -> Optional[Tuple[str, User]]:
-        """Generate new access token from refresh token"""
+    async def refresh_tokens(self, db: AsyncSession, refresh_token: str) -> Optional[Tuple[str, str, User]]:
+        """Issue a new access token from a refresh token, rotating the refresh token when due"""
         payload = self.jwt.verify_token(refresh_token)
         if not payload or payload.get('type') != 'refresh':
             return None
         
         user_id = int(payload.get('sub', 0))
-        user = await self.get_user_by_id(user_id)
+        user = await self.get_user_by_id(db, user_id)
         if not user or not user.is_active:
             return None
         
         new_access_token = self.jwt.create_token(user.id, "access")
-        return new_access_token, user
+        
+        # Rotate only once the refresh token is past half its lifetime; until
+        # then the client keeps using it and we skip signing a second token
+        refresh_lifetime = self.jwt.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+        if time.time() - payload.get('iat', 0) < refresh_lifetime / 2:
+            new_refresh_token = refresh_token
+        else:
+            new_refresh_token = self.jwt.create_token(user.id, "refresh")
+        
+        return new_access_token, new_refresh_token, user
+
+_auth_service = None
 
+def get_auth_service() -> AuthService:
+    global _auth_service
+    if _auth_service is None:
+        _auth_service = AuthService()
+    return _auth_service
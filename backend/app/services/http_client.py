@@ -0,0 +1,25 @@
+import httpx
+from typing import Optional
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared outbound HTTP client, so connections are pooled and kept alive across requests"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=30.0,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
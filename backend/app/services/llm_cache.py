@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# One JSON file per parsed LLM response, named by its cache key
+CACHE_DIR = Path(settings.llm_cache_dir)
+# Most keys (they include the page content) are never read again, so expired
+# files are also swept at startup and then at most this often, on write
+SWEEP_INTERVAL = 3600
+# A .tmp file older than this is left over from a failed write, not one in progress
+STALE_TMP_AGE = 600
+
+_last_sweep = 0.0
+
+
+def cache_key(*parts: str) -> str:
+    """Stable key for an LLM request built from its parts (provider, model, prompts)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _read(key: str) -> Optional[dict]:
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        if time.time() - path.stat().st_mtime > settings.llm_cache_ttl:
+            path.unlink(missing_ok=True)
+            return None
+        return orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def _write(key: str, payload: bytes) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = CACHE_DIR / f"{key}.json"
+    # Write then rename so readers never see a partial file
+    tmp_path = CACHE_DIR / f"{key}.{uuid.uuid4().hex}.tmp"
+    try:
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _sweep() -> int:
+    """Delete expired entries and stale temp files; returns how many were removed."""
+    now = time.time()
+    removed = 0
+    try:
+        entries = list(os.scandir(CACHE_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith(".json"):
+            max_age = settings.llm_cache_ttl
+        elif entry.name.endswith(".tmp"):
+            max_age = STALE_TMP_AGE
+        else:
+            continue
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+async def sweep() -> None:
+    """Remove expired entries in a worker thread."""
+    global _last_sweep
+    _last_sweep = time.monotonic()
+    if settings.llm_cache_ttl <= 0:
+        return
+    try:
+        removed = await asyncio.to_thread(_sweep)
+    except OSError as e:
+        print(f"[LLM cache] Sweep failed: {e}")
+        return
+    if removed:
+        print(f"[LLM cache] Removed {removed} expired files")
+
+
+async def get_response(key: str) -> Optional[dict]:
+    """Return the cached parsed response for a key, if present and not expired."""
+    if settings.llm_cache_ttl <= 0:
+        return None
+    return await asyncio.to_thread(_read, key)
+
+
+async def set_response(key: str, data: dict) -> None:
+    """Cache a parsed response; failures to write are logged and ignored."""
+    if settings.llm_cache_ttl <= 0:
+        return
+    # Serialize now, before the caller goes on to mutate data
+    payload = orjson.dumps(data)
+    try:
+        await asyncio.to_thread(_write, key, payload)
+    except OSError as e:
+        print(f"[LLM cache] Could not write {key}: {e}")
+    if time.monotonic() - _last_sweep > SWEEP_INTERVAL:
+        await sweep()
@@ -1,8 +1,14 @@
+import asyncio
 import httpx
 import json
+import orjson
 import re
+import threading
+from concurrent.futures import Future
 from typing import Optional
 from app.config import get_settings
+from app.services import llm_cache
+from app.services.http_client import get_http_client
 
 settings = get_settings()
 
@@ -13,6 +19,240 @@ settings = get_settings()
 MAX_CONTENT_LENGTH_LOCAL = 12000      # For Ollama
 MAX_CONTENT_LENGTH_CLOUD = 100000     # For OpenAI/Gemini (~25K tokens)
 
+# The same budgets in tokens, used when the tokenizer is available
+MAX_CONTENT_TOKENS_LOCAL = 3000
+MAX_CONTENT_TOKENS_CLOUD = 25000
+# Only this many chars per budgeted token are encoded, so a huge page
+# isn't tokenized in full just to be cut down
+CHARS_PER_TOKEN_BOUND = 8
+
+# Content shorter than this, or starting with one of these placeholders (set
+# when a transcript/transcription is unavailable), holds no recipe to parse
+MIN_CONTENT_LENGTH = 50
+NO_CONTENT_MARKERS = (
+    "Could not transcribe audio",
+    "Audio transcription is currently only supported",
+    "No content available for this video",
+)
+
+# Inputs/responses above this size are processed in a worker thread so the
+# string scans don't stall the event loop
+OFFLOAD_THRESHOLD = 50_000
+
+# Give up on an uploaded audio file that Gemini hasn't finished processing by then
+GEMINI_FILE_TIMEOUT = 300
+
+# Upper bound on concurrent edge-tts syntheses across all requests
+_tts_semaphore = asyncio.Semaphore(max(1, settings.tts_concurrency))
+# Seconds a single synthesis may take (not counting the wait for a slot);
+# a clip that times out is left without audio instead of stalling the parse
+TTS_TIMEOUT = 30.0
+
+# Kept byte-identical across requests and always sent first (system message /
+# prompt prefix), so providers' automatic prefix caching can reuse it
+SYSTEM_PROMPT = """You are an expert recipe structurer. Your ONLY job is to convert raw text into a perfectly structured JSON recipe.
+
+CRITICAL RULE: YOU MUST SPLIT INSTRUCTIONS INTO MANY SMALL STEPS.
+- ❌ BAD: "Preheat oven to 350. Mix dry ingredients in a bowl. Add wet ingredients and stir until combined." (This is 1 step. REJECTED.)
+- ✅ GOOD:
+  [
+    {"number": 1, "instruction": "Preheat oven to 350°F."},
+    {"number": 2, "instruction": "In a large bowl, whisk together flour, sugar, and salt."},
+    {"number": 3, "instruction": "Pour in the milk and eggs."},
+    {"number": 4, "instruction": "Stir gently until just combined."}
+  ]
+
+REQUIREMENTS:
+1.  **Break it down:** If a paragraph contains 5 actions, create 5 separate steps.
+2.  **No Chatter:** Do not include intro text ("Here is your recipe..."). Return ONLY JSON.
+3.  **Expressive Instructions:** Write clear, descriptive instructions. Do not be overly concise. Include helpful details (e.g., "Mix until the batter is smooth and no lumps remain" instead of just "Mix"). Explain WHY an action is taken if the context provides it. **If a step is very short (e.g. "Chop onions"), expand it to be more conversational and guiding (e.g. "Finely chop the onions, being careful to keep the pieces uniform for even cooking.").**
+4.  **Clean Text:** Remove "Step 1", "1.", icons, emojis, or navigation text from the instructions.
+5.  **Ingredients:** Extract all ingredients precisely.
+6.  **Tips:** If the content contains pro-tips, secrets, or advice, include them in the 'tips' field of the relevant step.
+7.  **Intro/Outro:**
+    -   **intro_text:** A brief, welcoming 1-2 sentence overview of what we are cooking.
+    -   **outro_text:** A friendly concluding sentence (e.g. "Serve hot and enjoy your meal!").
+8.  **Structure:** Follow this JSON schema EXACTLY:
+
+{
+    "title": "String",
+    "description": "String",
+    "intro_text": "String",
+    "outro_text": "String",
+    "prep_time": "String or null",
+    "cook_time": "String or null",
+    "total_time": "String or null",
+    "servings": "String or null",
+    "ingredients": [
+        {"name": "String", "amount": "String", "unit": "String", "notes": "String"}
+    ],
+    "steps": [
+        {"number": Integer, "instruction": "String", "duration": "String or null", "tips": "String or null"}
+    ],
+    "tags": ["String"]
+}"""
+
+# Longer timeout for CPU-based Ollama inference; connecting should still be quick
+# Permissive Gemini safety settings so recipe content isn't blocked; raw
+# dictionary keys/values avoid SDK version compatibility issues
+_SAFETY_SETTINGS = (
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+)
+
+OLLAMA_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+
+def _find_json_span(text: str) -> Optional[str]:
+    """First balanced {...} in text, or the rest of it if truncated; one linear scan."""
+    start = text.find('{')
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+_STEPS_ARRAY_RE = re.compile(r'"steps"\s*:\s*\[')
+
+
+class _StepStream:
+    """Picks complete objects out of the "steps" array of a streamed JSON response."""
+    
+    def __init__(self):
+        self.buffer = ""
+        self.pos = -1  # scan position inside the steps array, -1 until it opens
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.obj_start = 0
+        self.done = False
+    
+    def feed(self, chunk: str) -> list:
+        """Append a chunk and return the step objects it completed."""
+        self.buffer += chunk
+        if self.done:
+            return []
+        if self.pos < 0:
+            match = _STEPS_ARRAY_RE.search(self.buffer)
+            if not match:
+                return []
+            self.pos = match.end()
+        
+        steps = []
+        buf = self.buffer
+        i = self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                if self.depth == 0:
+                    self.obj_start = i
+                self.depth += 1
+            elif ch in '}]':
+                if self.depth == 0:
+                    # End of the steps array
+                    self.done = True
+                    break
+                self.depth -= 1
+                if self.depth == 0 and ch == '}':
+                    try:
+                        step = orjson.loads(buf[self.obj_start:i + 1])
+                        if isinstance(step, dict):
+                            steps.append(step)
+                    except orjson.JSONDecodeError:
+                        pass
+            i += 1
+        self.pos = i
+        return steps
+
+
+_encoding_future: Optional[Future] = None
+
+
+def _load_encoding(future: Future) -> None:
+    try:
+        import tiktoken
+        # May download the BPE file on first use, so this never runs on the event loop
+        encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception as e:
+        print(f"[LLM] Tokenizer unavailable, truncating by characters: {e}")
+        encoding = None
+    future.set_result(encoding)
+
+
+def _encoding_loader() -> Future:
+    """Future for the shared tiktoken encoding, loaded once in a background thread."""
+    global _encoding_future
+    if _encoding_future is None:
+        _encoding_future = Future()
+        threading.Thread(target=_load_encoding, args=(_encoding_future,), name="tiktoken-load", daemon=True).start()
+    return _encoding_future
+
+
+async def _get_encoding():
+    """Shared tiktoken encoding, or None if it can't be loaded (e.g. offline).
+    
+    Waits for the load rather than falling back to characters meanwhile, so
+    the same page always gives the same prompt (and llm_cache key).
+    """
+    return await asyncio.wrap_future(_encoding_loader())
+
+
+def warm_up_tokenizer() -> None:
+    """Start loading the tokenizer so it is ready before the first recipe is parsed."""
+    _encoding_loader()
+
+
+def _ingredient_narration(ing) -> str:
+    """Narration text for one ingredient: "amount unit name, notes"."""
+    if isinstance(ing, str):
+        return ing
+    if not isinstance(ing, dict):
+        return ""
+    base = " ".join(part for part in (ing.get("amount"), ing.get("unit"), ing.get("name")) if part)
+    notes = ing.get("notes")
+    return f"{base}, {notes}" if notes else base
+
+
+def _step_narration(step: dict) -> str:
+    """Narration text for a step, including its duration and tip."""
+    speech_text = f"Step {step.get('number')}. {step.get('instruction', '')}"
+    if step.get('duration'):
+        speech_text += f". Duration: {step['duration']}."
+    if step.get('tips'):
+        speech_text += f". Pro tip: {step['tips']}."
+    return speech_text
+
 
 class LLMService:
     def __init__(self):
@@ -23,6 +263,32 @@ class LLMService:
         self.openai_model = settings.openai_model
         self.gemini_api_key = settings.gemini_api_key
         self.gemini_model = settings.gemini_model
+        # Provider SDK clients, built on first use and then reused
+        self._openai_client = None
+        self._gemini_client = None
+    
+    def _get_openai_client(self):
+        """OpenAI client; reusing it keeps the SDK's connection pool warm."""
+        if self._openai_client is None:
+            import openai
+            self._openai_client = openai.AsyncOpenAI(api_key=self.openai_api_key)
+        return self._openai_client
+    
+    def _get_gemini_model(self):
+        """Gemini model; the SDK is configured once, on first use."""
+        if self._gemini_client is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.gemini_api_key)
+            self._gemini_client = genai.GenerativeModel(self.gemini_model)
+        return self._gemini_client
+    
+    def _model_name(self) -> str:
+        """Model used by the configured provider."""
+        if self.provider == "ollama":
+            return self.ollama_model
+        if self.provider == "openai":
+            return self.openai_model
+        return self.gemini_model
     
     def _get_max_content_length(self) -> int:
         """Get max content length based on LLM provider."""
@@ -32,29 +298,48 @@ class LLMService:
             # OpenAI and Gemini have much larger context windows
             return MAX_CONTENT_LENGTH_CLOUD
     
-    def _truncate_content(self, content: str, max_length: int = None) -> str:
+    def _get_max_content_tokens(self) -> int:
+        """Get max content tokens based on LLM provider."""
+        if self.provider == "ollama":
+            return MAX_CONTENT_TOKENS_LOCAL
+        return MAX_CONTENT_TOKENS_CLOUD
+    
+    def _truncate_content(self, content: str, max_length: int = None, encoding=None) -> str:
         """Truncate content to fit within LLM context window."""
-        if max_length is None:
-            max_length = self._get_max_content_length()
-        
-        if len(content) <= max_length:
-            return content
+        if encoding is not None and max_length is None:
+            # Cut at an exact token budget rather than a char count that
+            # over- or undershoots depending on the script
+            budget = self._get_max_content_tokens()
+            head = content[:budget * CHARS_PER_TOKEN_BOUND]
+            tokens = encoding.encode(head, disallowed_special=())
+            if len(tokens) <= budget and len(head) == len(content):
+                return content
+            truncated = encoding.decode(tokens[:budget])
+            max_length = len(truncated)
+        else:
+            if max_length is None:
+                max_length = self._get_max_content_length()
+            
+            if len(content) <= max_length:
+                return content
+            
+            truncated = content[:max_length]
         
         # Try to truncate at a sentence boundary
-        truncated = content[:max_length]
         last_period = truncated.rfind('.')
         if last_period > max_length * 0.8:  # Only use period if it's not too far back
             truncated = truncated[:last_period + 1]
         
         return truncated + "\n\n[Content truncated for processing]"
     
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None, on_step=None) -> str:
+        """Generate a response; on_step, if given, is called with each recipe step as it streams in (Gemini only)."""
         if self.provider == "ollama":
             return await self._generate_ollama(prompt, system_prompt)
         elif self.provider == "openai":
             return await self._generate_openai(prompt, system_prompt)
         elif self.provider == "gemini":
-            return await self._generate_gemini(prompt, system_prompt)
+            return await self._generate_gemini(prompt, system_prompt, on_step)
         else:
             raise ValueError(f"Unknown LLM provider: {self.provider}")
     
@@ -78,30 +363,27 @@ class LLMService:
             }
         }
         
-        # Longer timeout for CPU-based inference
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            try:
-                response = await client.post(url, json=payload)
-                print(f"[Ollama] Response status: {response.status_code}")
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    print(f"[Ollama] Error response: {error_text[:500]}")
-                    raise Exception(f"Ollama returned {response.status_code}: {error_text[:200]}")
-                
-                result = response.json()
-                return result.get("response", "")
-            except httpx.TimeoutException as e:
-                print(f"[Ollama] Request timed out after 300s")
-                raise Exception(f"Ollama request timed out - the model may be too slow on CPU") from e
-            except httpx.RequestError as e:
-                print(f"[Ollama] Request error: {e}")
-                raise Exception(f"Could not connect to Ollama at {url}: {e}") from e
+        # Uses the shared keep-alive client instead of a new connection per call
+        try:
+            response = await get_http_client().post(url, json=payload, timeout=OLLAMA_TIMEOUT)
+            print(f"[Ollama] Response status: {response.status_code}")
+            
+            if response.status_code != 200:
+                error_text = response.text
+                print(f"[Ollama] Error response: {error_text[:500]}")
+                raise Exception(f"Ollama returned {response.status_code}: {error_text[:200]}")
+            
+            result = response.json()
+            return result.get("response", "")
+        except httpx.TimeoutException as e:
+            print(f"[Ollama] Request timed out after 300s")
+            raise Exception(f"Ollama request timed out - the model may be too slow on CPU") from e
+        except httpx.RequestError as e:
+            print(f"[Ollama] Request error: {e}")
+            raise Exception(f"Could not connect to Ollama at {url}: {e}") from e
     
     async def _generate_openai(self, prompt: str, system_prompt: Optional[str] = None) -> str:
-        import openai
-        
-        client = openai.AsyncOpenAI(api_key=self.openai_api_key)
+        client = self._get_openai_client()
         
         messages = []
         if system_prompt:
@@ -117,25 +399,15 @@ class LLMService:
         
         return response.choices[0].message.content
     
-    async def _generate_gemini(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    async def _generate_gemini(self, prompt: str, system_prompt: Optional[str] = None, on_step=None) -> str:
         import google.generativeai as genai
         
-        genai.configure(api_key=self.gemini_api_key)
-        model = genai.GenerativeModel(self.gemini_model)
+        model = self._get_gemini_model()
         
         full_prompt = prompt
         if system_prompt:
             full_prompt = f"{system_prompt}\n\n{prompt}"
         
-        # Configure safety settings to be permissive for recipe content
-        # Using raw dictionary keys/values to avoid version compatibility issues
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        
         try:
             response = await model.generate_content_async(
                 full_prompt,
@@ -143,9 +415,19 @@ class LLMService:
                     temperature=0.3,
                     max_output_tokens=4096  # Increased for larger context
                 ),
-                safety_settings=safety_settings
+                safety_settings=_SAFETY_SETTINGS,
+                stream=on_step is not None
             )
-            return response.text
+            if on_step is None:
+                return response.text
+            
+            # Hand each step over as soon as its object is complete, so its
+            # audio is generated while the rest of the response streams in
+            stream = _StepStream()
+            async for chunk in response:
+                for step in stream.feed(chunk.text):
+                    on_step(step)
+            return stream.buffer
         except ValueError as e:
             # Handle blocked response or other generation errors
             print(f"Gemini generation error: {e}")
@@ -162,11 +444,6 @@ class LLMService:
     
     def _repair_json(self, json_str: str) -> Optional[dict]:
         """Attempt to repair truncated or malformed JSON."""
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            pass
-            
         # 1. Remove markdown code blocks if still present
         json_str = json_str.strip()
         if json_str.startswith("```"):
@@ -176,65 +453,138 @@ class LLMService:
             if lines and lines[-1].startswith("```"):
                 lines = lines[:-1]
             json_str = "\n".join(lines)
+        
+        # Well-formed responses (the common case) are parsed exactly once
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            pass
             
         # 2. Handle truncation
         # If it ends with a trailing comma, remove it
         json_str = json_str.rstrip().rstrip(',')
         
-        # Close open quotes if needed
-        if json_str.count('"') % 2 != 0:
-            json_str += '"'
-            
-        # Close open brackets/braces
-        open_braces = json_str.count('{')
-        close_braces = json_str.count('}')
-        open_brackets = json_str.count('[')
-        close_brackets = json_str.count(']')
-        
-        # Naive approach: append missing closures
-        # Usually we are deep in: { ... "steps": [ { ... 
-        # So we likely need to close object }, then array ], then main object }
-        # But exact order depends on structure.
+        # Close open strings and brackets. One pass tracks string state and a
+        # stack of open brackets, so closers come out innermost-first, e.g.
+        # {"steps": [{"instruction": "foo  ->  ..."}]}
+        stack = []
+        in_string = False
+        escaped = False
+        for ch in json_str:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                stack.append('}')
+            elif ch == '[':
+                stack.append(']')
+            elif ch in '}]' and stack:
+                stack.pop()
         
-        # Simple stack-based closer could be better, but naive counting often works for simple truncation
-        padding = (']' * (open_brackets - close_brackets)) + ('}' * (open_braces - close_braces))
+        if in_string:
+            if escaped:
+                # Drop a dangling backslash so it doesn't escape our closing quote
+                json_str = json_str[:-1]
+            json_str += '"'
+        padding = "".join(reversed(stack))
         
         try:
-            return json.loads(json_str + padding)
-        except json.JSONDecodeError:
+            return orjson.loads(json_str + padding)
+        except orjson.JSONDecodeError:
             return None
 
+    def _fallback_recipe(self, content: str) -> dict:
+        """Basic recipe structure used when no recipe could be extracted."""
+        return {
+            "title": "Untitled Recipe",
+            "description": "Could not parse recipe description",
+            "prep_time": None,
+            "cook_time": None,
+            "total_time": None,
+            "servings": None,
+            "ingredients": [],
+            "steps": [{"number": 1, "instruction": content[:500], "duration": None, "tips": None}],
+            "tags": []
+        }
+    
+    def _parse_response(self, response: str) -> dict:
+        """Extract the recipe JSON from a raw LLM response and fix up lazy output."""
+        # Clean up response (remove markdown code blocks if present)
+        cleaned_response = response.strip()
+        if cleaned_response.startswith("```json"):
+            cleaned_response = cleaned_response[7:]
+        elif cleaned_response.startswith("```"):
+            cleaned_response = cleaned_response[3:]
+        if cleaned_response.endswith("```"):
+            cleaned_response = cleaned_response[:-3]
+        
+        cleaned_response = cleaned_response.strip()
+        
+        # Extract JSON from response
+        data = self._repair_json(cleaned_response)
+        
+        # If repair failed, try the JSON object embedded in surrounding chatter
+        if not data:
+            json_span = _find_json_span(cleaned_response)
+            if json_span:
+                data = self._repair_json(json_span)
+        
+        if not data:
+            raise json.JSONDecodeError("Could not decode JSON even after repair", cleaned_response, 0)
+        
+        # POST-PROCESSING: Fallback for lazy LLM (Single step fix)
+        steps = data.get("steps", [])
+        if len(steps) < 3 and steps:
+            first_step = steps[0].get("instruction", "")
+            if len(first_step) > 300:
+                sentences = [s.strip() + "." for s in first_step.split(". ") if s.strip()]
+                new_steps = []
+                for i, sent in enumerate(sentences, 1):
+                    new_steps.append({
+                        "number": i,
+                        "instruction": sent,
+                        "duration": None,
+                        "tips": None
+                    })
+                if len(new_steps) > 1:
+                    data["steps"] = new_steps
+        
+        return data
+
     async def _transcribe_audio_gemini(self, audio_path: str) -> str:
         import google.generativeai as genai
         
-        genai.configure(api_key=self.gemini_api_key)
-        
-        # Safety settings to prevent blocking
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
+        model = self._get_gemini_model()
         
         try:
             print(f"Uploading audio file {audio_path} to Gemini...")
             # Upload the file
-            audio_file = genai.upload_file(path=audio_path)
+            audio_file = await asyncio.to_thread(genai.upload_file, path=audio_path)
             
-            # Wait for file to be processed
-            import time
+            # Wait for file to be processed, backing off between polls
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + GEMINI_FILE_TIMEOUT
+            delay = 0.5
             while audio_file.state.name == "PROCESSING":
+                if loop.time() >= deadline:
+                    print(f"Audio file still processing after {GEMINI_FILE_TIMEOUT}s, giving up")
+                    return ""
                 print("Waiting for audio file to be processed...")
-                time.sleep(2)
-                audio_file = genai.get_file(audio_file.name)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 8.0)
+                audio_file = await asyncio.to_thread(genai.get_file, audio_file.name)
             
             if audio_file.state.name == "FAILED":
                 print(f"Audio file processing failed: {audio_file.state}")
                 return ""
             
             # Prompt for transcription with safety settings
-            model = genai.GenerativeModel(self.gemini_model)
             response = await model.generate_content_async(
                 [
                     "Transcribe this audio. Focus on extracting recipe instructions, ingredients, and cooking steps. Write everything spoken clearly.",
@@ -244,7 +594,7 @@ class LLMService:
                     temperature=0.2,
                     max_output_tokens=8192  # Larger output for transcriptions
                 ),
-                safety_settings=safety_settings
+                safety_settings=_SAFETY_SETTINGS
             )
             
             # Handle potential blocked or empty response
@@ -301,51 +651,21 @@ class LLMService:
             except Exception as e:
                 print(f"Error removing temp audio file: {e}")
 
-        # Truncate content to fit in context window
-        truncated_content = self._truncate_content(content)
+        # Truncate content to fit in context window, then drop the full text
+        # so it isn't kept alive for the duration of the LLM request
+        encoding = await _get_encoding()
+        if len(content) > OFFLOAD_THRESHOLD:
+            truncated_content = await asyncio.to_thread(self._truncate_content, content, None, encoding)
+        else:
+            truncated_content = self._truncate_content(content, encoding=encoding)
+        del content
+        
+        # Nothing to structure (empty page, failed transcription): skip the LLM
+        # and TTS round trips and return the stub straight away
+        if len(truncated_content.strip()) < MIN_CONTENT_LENGTH or truncated_content.startswith(NO_CONTENT_MARKERS):
+            print(f"[LLM] Skipping LLM for trivial content ({len(truncated_content)} chars)")
+            return self._fallback_recipe(truncated_content)
         
-        system_prompt = """You are an expert recipe structurer. Your ONLY job is to convert raw text into a perfectly structured JSON recipe.
-
-CRITICAL RULE: YOU MUST SPLIT INSTRUCTIONS INTO MANY SMALL STEPS.
-- ❌ BAD: "Preheat oven to 350. Mix dry ingredients in a bowl. Add wet ingredients and stir until combined." (This is 1 step. REJECTED.)
-- ✅ GOOD:
-  [
-    {"number": 1, "instruction": "Preheat oven to 350°F."},
-    {"number": 2, "instruction": "In a large bowl, whisk together flour, sugar, and salt."},
-    {"number": 3, "instruction": "Pour in the milk and eggs."},
-    {"number": 4, "instruction": "Stir gently until just combined."}
-  ]
-
-REQUIREMENTS:
-1.  **Break it down:** If a paragraph contains 5 actions, create 5 separate steps.
-2.  **No Chatter:** Do not include intro text ("Here is your recipe..."). Return ONLY JSON.
-3.  **Expressive Instructions:** Write clear, descriptive instructions. Do not be overly concise. Include helpful details (e.g., "Mix until the batter is smooth and no lumps remain" instead of just "Mix"). Explain WHY an action is taken if the context provides it. **If a step is very short (e.g. "Chop onions"), expand it to be more conversational and guiding (e.g. "Finely chop the onions, being careful to keep the pieces uniform for even cooking.").**
-4.  **Clean Text:** Remove "Step 1", "1.", icons, emojis, or navigation text from the instructions.
-5.  **Ingredients:** Extract all ingredients precisely.
-6.  **Tips:** If the content contains pro-tips, secrets, or advice, include them in the 'tips' field of the relevant step.
-7.  **Intro/Outro:**
-    -   **intro_text:** A brief, welcoming 1-2 sentence overview of what we are cooking.
-    -   **outro_text:** A friendly concluding sentence (e.g. "Serve hot and enjoy your meal!").
-8.  **Structure:** Follow this JSON schema EXACTLY:
-
-{
-    "title": "String",
-    "description": "String",
-    "intro_text": "String",
-    "outro_text": "String",
-    "prep_time": "String or null",
-    "cook_time": "String or null",
-    "total_time": "String or null",
-    "servings": "String or null",
-    "ingredients": [
-        {"name": "String", "amount": "String", "unit": "String", "notes": "String"}
-    ],
-    "steps": [
-        {"number": Integer, "instruction": "String", "duration": "String or null", "tips": "String or null"}
-    ],
-    "tags": ["String"]
-}"""
-
         prompt = f"""Parse this {source_type} content into the structured JSON format defined above.
         
 CONTENT:
@@ -353,118 +673,91 @@ CONTENT:
 
 REMEMBER: Split instructions into as many small, logical steps as possible. Do not lump them together."""
 
+        from app.services.tts_service import get_tts_service
+        
+        tts = get_tts_service()
+        
+        async def _synthesize(text: str) -> str:
+            async with _tts_semaphore:
+                return await asyncio.wait_for(tts.generate_audio(text, voice=voice), TTS_TIMEOUT)
+        
+        # Identical narration text within this recipe is synthesized once
+        # and the resulting URL shared
+        audio_tasks = {}
+        
+        def synthesize(text: str) -> asyncio.Task:
+            key = text.strip().lower()
+            task = audio_tasks.get(key)
+            if task is None:
+                task = audio_tasks[key] = asyncio.create_task(_synthesize(text))
+            return task
+        
+        def prefetch_step_audio(step: dict):
+            # Started while the LLM is still streaming; the final parse picks
+            # the task up again through synthesize() when the text matches
+            if step.get("instruction"):
+                synthesize(_step_narration(step))
+        
+        async def discard_unused_audio(used: set):
+            # Prefetched audio whose step changed in the final parse is deleted
+            results = await asyncio.gather(*audio_tasks.values(), return_exceptions=True)
+            unused = [url for url in results if isinstance(url, str) and url not in used]
+            if unused:
+                await asyncio.gather(*(tts.delete_audio(url) for url in unused), return_exceptions=True)
+        
         try:
-            response = await self.generate(prompt, system_prompt)
-            
-            # Clean up response (remove markdown code blocks if present)
-            cleaned_response = response.strip()
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response[7:]
-            elif cleaned_response.startswith("```"):
-                cleaned_response = cleaned_response[3:]
-            if cleaned_response.endswith("```"):
-                cleaned_response = cleaned_response[:-3]
-            
-            cleaned_response = cleaned_response.strip()
-            
-            # Extract JSON from response
-            data = self._repair_json(cleaned_response)
-            
-            # If repair failed, try regex
-            if not data:
-                json_match = re.search(r'\{[\s\S]*\}', cleaned_response)
-                if json_match:
-                    data = self._repair_json(json_match.group())
-            
-            if not data:
-                raise json.JSONDecodeError("Could not decode JSON even after repair", cleaned_response, 0)
-            
-            # POST-PROCESSING: Fallback for lazy LLM (Single step fix)
-            steps = data.get("steps", [])
-            if len(steps) < 3 and steps:
-                first_step = steps[0].get("instruction", "")
-                if len(first_step) > 300:
-                    sentences = [s.strip() + "." for s in first_step.split(". ") if s.strip()]
-                    new_steps = []
-                    for i, sent in enumerate(sentences, 1):
-                        new_steps.append({
-                            "number": i,
-                            "instruction": sent,
-                            "duration": None,
-                            "tips": None
-                        })
-                    if len(new_steps) > 1:
-                        data["steps"] = new_steps
+            # Identical requests (same provider, model and prompt) reuse the parsed
+            # result instead of running inference again
+            key = llm_cache.cache_key(self.provider, self._model_name(), SYSTEM_PROMPT, prompt)
+            data = await llm_cache.get_response(key)
+            if data is not None:
+                print("[LLM] Using cached response")
+            else:
+                response = await self.generate(prompt, SYSTEM_PROMPT, on_step=prefetch_step_audio)
+                if len(response) > OFFLOAD_THRESHOLD:
+                    data = await asyncio.to_thread(self._parse_response, response)
+                else:
+                    data = self._parse_response(response)
+                await llm_cache.set_response(key, data)
             
             # GENERATE AUDIO FOR STEPS
             try:
-                from app.services.tts_service import get_tts_service
-                import asyncio
-                
-                tts = get_tts_service()
                 print(f"[TTS] Starting audio generation for {len(data.get('steps', []))} steps...")
                 
-                # Generate Intro Audio
-                if data.get("intro_text"):
+                async def process_intro_audio():
                     try:
-                        intro_url = await tts.generate_audio(data["intro_text"], voice=voice)
+                        intro_url = await synthesize(data["intro_text"])
                         data["intro_audio_url"] = intro_url
                         print(f"[TTS] Intro audio: {intro_url}")
                     except Exception as e:
                         print(f"[TTS] Failed to generate intro audio: {e}")
-
-                # Generate Outro Audio
-                if data.get("outro_text"):
+                
+                async def process_outro_audio():
                     try:
-                        outro_url = await tts.generate_audio(data["outro_text"], voice=voice)
+                        outro_url = await synthesize(data["outro_text"])
                         data["outro_audio_url"] = outro_url
                         print(f"[TTS] Outro audio: {outro_url}")
                     except Exception as e:
                         print(f"[TTS] Failed to generate outro audio: {e}")
-
-                # Generate Ingredients Audio
-                ingredients = data.get("ingredients", [])
-                if ingredients:
+                
+                async def process_ingredients_audio(ingredients):
                     try:
-                        ing_text = "Ingredients. "
-                        ing_list = []
-                        for ing in ingredients:
-                            if isinstance(ing, dict):
-                                parts = []
-                                if ing.get('amount'): parts.append(ing.get('amount'))
-                                if ing.get('unit'): parts.append(ing.get('unit'))
-                                if ing.get('name'): parts.append(ing.get('name'))
-                                item = " ".join(parts)
-                                if ing.get('notes'):
-                                    item += f", {ing.get('notes')}"
-                                ing_list.append(item)
-                            elif isinstance(ing, str):
-                                ing_list.append(ing)
-                        
-                        ing_text += ". ".join(ing_list)
+                        ing_text = "Ingredients. " + ". ".join(filter(None, map(_ingredient_narration, ingredients)))
                         
                         # Limit length to avoid issues
                         if len(ing_text) > 4000:
                             ing_text = ing_text[:4000] + "..."
                             
-                        ing_url = await tts.generate_audio(ing_text, voice=voice)
+                        ing_url = await synthesize(ing_text)
                         data["ingredients_audio_url"] = ing_url
                         print(f"[TTS] Ingredients audio: {ing_url}")
                     except Exception as e:
                         print(f"[TTS] Failed to generate ingredients audio: {e}")
 
                 async def process_step_audio(step):
-                    instruction = step.get("instruction", "")
-                    if instruction:
-                        # Compose full text for narration including tips and duration
-                        speech_text = f"Step {step.get('number')}. {instruction}"
-                        if step.get('duration'):
-                            speech_text += f". Duration: {step['duration']}."
-                        if step.get('tips'):
-                            speech_text += f". Pro tip: {step['tips']}."
-                            
+                    if step.get("instruction"):
                         try:
-                            audio_url = await tts.generate_audio(speech_text, voice=voice)
+                            audio_url = await synthesize(_step_narration(step))
                             step["audio_url"] = audio_url
                             print(f"[TTS] Step {step.get('number')} audio: {audio_url}")
                         except Exception as e:
@@ -472,8 +765,19 @@ REMEMBER: Split instructions into as many small, logical steps as possible. Do n
                             import traceback
                             print(traceback.format_exc())
 
-                # Generate audio in parallel
-                await asyncio.gather(*[process_step_audio(step) for step in data.get("steps", [])])
+                # Generate intro, outro, ingredients and step audio in parallel
+                tasks = [process_step_audio(step) for step in data.get("steps", [])]
+                if data.get("intro_text"):
+                    tasks.append(process_intro_audio())
+                if data.get("outro_text"):
+                    tasks.append(process_outro_audio())
+                if data.get("ingredients"):
+                    tasks.append(process_ingredients_audio(data["ingredients"]))
+                await asyncio.gather(*tasks)
+                
+                used = {data.get("intro_audio_url"), data.get("outro_audio_url"), data.get("ingredients_audio_url")}
+                used.update(step.get("audio_url") for step in data.get("steps", []))
+                await discard_unused_audio(used)
                 print(f"[TTS] Audio generation complete.")
                 
             except Exception as e:
@@ -486,19 +790,11 @@ REMEMBER: Split instructions into as many small, logical steps as possible. Do n
         except json.JSONDecodeError as e:
             print(f"JSON parsing error: {e}")
             print(f"Response was: {response if response else 'empty'}")
+            await discard_unused_audio(set())
             # Return a basic structure if parsing fails
-            return {
-                "title": "Untitled Recipe",
-                "description": "Could not parse recipe description",
-                "prep_time": None,
-                "cook_time": None,
-                "total_time": None,
-                "servings": None,
-                "ingredients": [],
-                "steps": [{"number": 1, "instruction": truncated_content[:500], "duration": None, "tips": None}],
-                "tags": []
-            }
+            return self._fallback_recipe(truncated_content)
         except Exception as e:
+            await discard_unused_audio(set())
             import traceback
             print(f"LLM error: {e}")
             print(f"LLM provider: {self.provider}")
@@ -506,5 +802,11 @@ REMEMBER: Split instructions into as many small, logical steps as possible. Do n
             raise
 
 
+_llm_service = None
+
+
 def get_llm_service() -> LLMService:
-    return LLMService()
+    global _llm_service
+    if _llm_service is None:
+        _llm_service = LLMService()
+    return _llm_service
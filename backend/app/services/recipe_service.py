@@ -1,12 +1,111 @@
+import asyncio
+import hashlib
+from cachetools import TTLCache
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, func, and_, cast, String
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
-from app.models.recipe import Recipe
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased, raiseload
+from sqlalchemy import select, insert, update, delete, or_, func, and_, false, cast, literal, Integer, String, Text, Row, literal_column
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from uuid import UUID
+from app.models.recipe import Recipe, RecipeAudio
 from app.schemas.recipe import RecipeCreate, RecipeResponse
 from app.services.tts_service import get_tts_service
 
 
+# Recipes already parsed from a URL, keyed by normalized URL and narration voice,
+# so repeat submissions (from any user) can skip the scrape + LLM pipeline
+_parsed_recipe_ids = TTLCache(maxsize=10_000, ttl=86400)
+
+
+def normalize_recipe_url(url: str) -> str:
+    """Canonical form of a recipe URL: lowercase host, no utm_* params or trailing slash"""
+    parts = urlsplit(url.strip())
+    query = urlencode([
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_")
+    ])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), query, ""))
+
+
+def _select_recipe():
+    """SELECT of full Recipe entities; lazy loads raise instead of failing later with MissingGreenlet"""
+    return select(Recipe).options(raiseload("*"))
+
+
+def _audio_urls(intro_audio_url, outro_audio_url, ingredients_audio_url, steps) -> set:
+    """Every narration audio URL a recipe references"""
+    urls = {intro_audio_url, outro_audio_url, ingredients_audio_url}
+    urls.update(step.get("audio_url") for step in steps or () if isinstance(step, dict))
+    urls.discard(None)
+    urls.discard("")
+    return urls
+
+
+def _parsed_recipe_key(url: str, voice_id: Optional[str]) -> str:
+    return hashlib.sha256(f"{voice_id or ''}|{url}".encode()).hexdigest()
+
+
+# Columns the recipe list endpoints serialize (RecipeResponse); loading these
+# as plain rows skips ORM identity-map bookkeeping and the unused raw_content
+_LIST_COLUMNS = (
+    Recipe.id,
+    Recipe.title,
+    Recipe.source_url,
+    Recipe.source_type,
+    Recipe.description,
+    Recipe.image_url,
+    Recipe.prep_time,
+    Recipe.cook_time,
+    Recipe.total_time,
+    Recipe.servings,
+    Recipe.ingredients,
+    Recipe.steps,
+    Recipe.tags,
+    Recipe.created_at,
+    Recipe.updated_at,
+    Recipe.intro_text,
+    Recipe.outro_text,
+    Recipe.intro_audio_url,
+    Recipe.outro_audio_url,
+    Recipe.ingredients_audio_url,
+    Recipe.user_id,
+    Recipe.anonymous_user_id,
+    Recipe.is_public,
+)
+
+# Content columns carried over when a recipe is copied to another owner
+_COPIED_COLUMNS = (
+    Recipe.title,
+    Recipe.source_url,
+    Recipe.source_type,
+    Recipe.description,
+    Recipe.image_url,
+    Recipe.prep_time,
+    Recipe.cook_time,
+    Recipe.total_time,
+    Recipe.servings,
+    Recipe.ingredients,
+    Recipe.steps,
+    Recipe.tags,
+    Recipe.raw_content,
+    Recipe.intro_text,
+    Recipe.outro_text,
+    Recipe.intro_audio_url,
+    Recipe.outro_audio_url,
+    Recipe.ingredients_audio_url,
+)
+
+# The same columns as a RecipeResponse-shaped JSON object built by Postgres
+_RECIPE_JSON = cast(
+    func.json_build_object(
+        *[arg for column in _LIST_COLUMNS for arg in (literal_column(f"'{column.key}'"), column)]
+    ),
+    Text
+)
+
+
 class RecipeService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -17,54 +116,57 @@ class RecipeService:
         user_id: Optional[int] = None,
         anonymous_user_id: Optional[str] = None,
         commit: bool = True
-    ) -> Recipe:
-        # Convert pydantic models to dicts for JSON storage
-        ingredients = [ing.model_dump() for ing in recipe_data.ingredients]
-        steps = [step.model_dump() for step in recipe_data.steps]
+    ) -> Optional[Recipe]:
+        """Insert a recipe; returns None if the owner already has one for this URL"""
+        # One dump of the whole model (nested ingredients/steps included) gives
+        # JSON-ready column values
+        values = recipe_data.model_dump(mode="json")
+        values["tags"] = values["tags"] or []
+        values["user_id"] = user_id or values["user_id"]
+        values["anonymous_user_id"] = anonymous_user_id or values["anonymous_user_id"]
         
-        recipe = Recipe(
-            title=recipe_data.title,
-            source_url=recipe_data.source_url,
-            source_type=recipe_data.source_type,
-            description=recipe_data.description,
-            image_url=recipe_data.image_url,
-            prep_time=recipe_data.prep_time,
-            cook_time=recipe_data.cook_time,
-            total_time=recipe_data.total_time,
-            servings=recipe_data.servings,
-            ingredients=ingredients,
-            steps=steps,
-            tags=recipe_data.tags or [],
-            raw_content=recipe_data.raw_content,
-            intro_text=recipe_data.intro_text,
-            outro_text=recipe_data.outro_text,
-            intro_audio_url=recipe_data.intro_audio_url,
-            outro_audio_url=recipe_data.outro_audio_url,
-            ingredients_audio_url=recipe_data.ingredients_audio_url,
-            user_id=user_id or recipe_data.user_id,
-            anonymous_user_id=anonymous_user_id or recipe_data.anonymous_user_id
-        )
+        # INSERT ... RETURNING hands back the row with its server-generated
+        # columns, so there's no refresh SELECT afterwards. A row conflicting with
+        # the per-owner URL unique indexes is skipped and nothing is returned
+        stmt = pg_insert(Recipe).values(**values).on_conflict_do_nothing().returning(Recipe)
         
-        self.db.add(recipe)
+        result = await self.db.execute(stmt)
+        recipe = result.scalar_one_or_none()
+        if recipe is None:
+            return None
+        await self._link_audio(recipe.id, _audio_urls(
+            recipe.intro_audio_url, recipe.outro_audio_url, recipe.ingredients_audio_url, recipe.steps
+        ))
         if commit:
             await self.db.commit()
-            await self.db.refresh(recipe)
-        else:
-            await self.db.flush()
-            await self.db.refresh(recipe)
         
         return recipe
     
-    async def get_recipe(self, recipe_id: str) -> Optional[Recipe]:
+    async def _link_audio(self, recipe_id: UUID, audio_urls: set) -> None:
+        """Record which audio files a recipe references (see RecipeAudio)"""
+        if audio_urls:
+            await self.db.execute(
+                insert(RecipeAudio),
+                [{"recipe_id": recipe_id, "audio_url": url} for url in audio_urls]
+            )
+    
+    async def get_recipe(self, recipe_id: UUID) -> Optional[Recipe]:
+        result = await self.db.execute(
+            _select_recipe().where(Recipe.id == recipe_id)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_recipe_json(self, recipe_id: UUID) -> Optional[str]:
+        """Get a recipe already serialized to RecipeResponse JSON by the database"""
         result = await self.db.execute(
-            select(Recipe).where(Recipe.id == recipe_id)
+            select(_RECIPE_JSON).where(Recipe.id == recipe_id)
         )
         return result.scalar_one_or_none()
     
     async def get_all_recipes(self, skip: int = 0, limit: int = 100) -> List[Recipe]:
         """Get all recipes (admin use only)"""
         result = await self.db.execute(
-            select(Recipe)
+            _select_recipe()
             .order_by(Recipe.created_at.desc())
             .offset(skip)
             .limit(limit)
@@ -90,7 +192,7 @@ class RecipeService:
             return []
         
         result = await self.db.execute(
-            select(Recipe)
+            _select_recipe()
             .where(or_(*conditions))
             .order_by(Recipe.created_at.desc())
             .offset(skip)
@@ -98,16 +200,66 @@ class RecipeService:
         )
         return result.scalars().all()
     
-    async def search_user_recipes(
+    async def _get_page(self, where, skip: int, limit: int) -> Tuple[List[Row], int]:
+        """Fetch a newest-first page of list rows plus the total match count in one query"""
+        result = await self.db.execute(
+            select(*_LIST_COLUMNS, func.count().over().label("total"))
+            .where(where)
+            .order_by(Recipe.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        rows = result.all()
+        
+        if not rows:
+            if not skip:
+                return [], 0
+            # A page past the end has no row to carry the window count
+            result = await self.db.execute(select(func.count(Recipe.id)).where(where))
+            return [], result.scalar()
+        
+        return rows, rows[0].total
+    
+    async def get_user_recipes_page(
+        self,
+        user_id: Optional[int] = None,
+        anonymous_user_id: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        tag: Optional[str] = None
+    ) -> Tuple[List[Row], int]:
+        """Get a page of a user's recipes (as column rows) and their total count in one query"""
+        conditions = []
+        
+        if user_id:
+            conditions.append(Recipe.user_id == user_id)
+        if anonymous_user_id:
+            conditions.append(Recipe.anonymous_user_id == anonymous_user_id)
+        
+        if not conditions:
+            return [], 0
+        
+        where = or_(*conditions)
+        if tag:
+            # JSONB containment, served by the jsonb_path_ops GIN index on tags
+            where = and_(where, Recipe.tags.contains([tag]))
+        
+        return await self._get_page(where, skip, limit)
+    
+    async def search_user_recipes_page(
         self,
         query: str,
         user_id: Optional[int] = None,
         anonymous_user_id: Optional[str] = None,
         skip: int = 0,
         limit: int = 100
-    ) -> List[Recipe]:
-        """Search recipes for a specific user"""
-        search_term = f"%{query}%"
+    ) -> Tuple[List[Row], int]:
+        """Search a user's recipes; returns a page of column rows and the total match count"""
+        # Full-text matches (stemmed words, via the search_vec GIN index) plus substring
+        # matches; leading-wildcard ILIKE is served by the pg_trgm GIN indexes on title/description.
+        # LIKE wildcards in the query are escaped so "%" or "_" can't match every row
+        escaped = query.replace("/", "//").replace("%", "/%").replace("_", "/_")
+        search_term = f"%{escaped}%"
         
         # Build ownership conditions
         ownership_conditions = []
@@ -117,36 +269,26 @@ class RecipeService:
             ownership_conditions.append(Recipe.anonymous_user_id == anonymous_user_id)
         
         if not ownership_conditions:
-            return []
+            return [], 0
         
-        result = await self.db.execute(
-            select(Recipe)
-            .where(
-                and_(
-                    or_(*ownership_conditions),
-                    or_(
-                        Recipe.title.ilike(search_term),
-                        Recipe.description.ilike(search_term)
-                    )
-                )
+        where = and_(
+            or_(*ownership_conditions),
+            or_(
+                Recipe.search_vec.op("@@")(func.plainto_tsquery("english", query)),
+                Recipe.title.ilike(search_term, escape="/"),
+                Recipe.description.ilike(search_term, escape="/")
             )
-            .order_by(Recipe.created_at.desc())
-            .offset(skip)
-            .limit(limit)
         )
-        return result.scalars().all()
+        return await self._get_page(where, skip, limit)
     
     async def search_recipes(self, query: str, skip: int = 0, limit: int = 100) -> List[Recipe]:
-        search_term = f"%{query}%"
+        """Full-text search over all recipes, best matches first (admin use only)"""
+        # Served by the GIN index on the generated search_vec column
+        ts_query = func.plainto_tsquery("english", query)
         result = await self.db.execute(
-            select(Recipe)
-            .where(
-                or_(
-                    Recipe.title.ilike(search_term),
-                    Recipe.description.ilike(search_term)
-                )
-            )
-            .order_by(Recipe.created_at.desc())
+            _select_recipe()
+            .where(Recipe.search_vec.op("@@")(ts_query))
+            .order_by(func.ts_rank(Recipe.search_vec, ts_query).desc(), Recipe.created_at.desc())
             .offset(skip)
             .limit(limit)
         )
@@ -154,67 +296,58 @@ class RecipeService:
     
     async def delete_recipe(
         self,
-        recipe_id: str,
+        recipe_id: UUID,
         user_id: Optional[int] = None,
         anonymous_user_id: Optional[str] = None
     ) -> bool:
         """Delete a recipe only if owned by the requester (or legacy unowned)."""
-        recipe = await self.get_recipe(recipe_id)
-        if not recipe:
-            return False
-        
-        # Ownership check
+        # Ownership is checked by the DELETE itself, so this is one round trip
         if user_id or anonymous_user_id:
-            is_owner = False
-            if user_id and recipe.user_id == user_id:
-                is_owner = True
-            if anonymous_user_id and recipe.anonymous_user_id == anonymous_user_id:
-                is_owner = True
-            if not is_owner:
-                return False
+            ownership = []
+            if user_id:
+                ownership.append(Recipe.user_id == user_id)
+            if anonymous_user_id:
+                ownership.append(Recipe.anonymous_user_id == anonymous_user_id)
+            owned = or_(*ownership)
         else:
             # If recipe is associated to a user/anonymous owner, disallow deletion without identity
-            if recipe.user_id or recipe.anonymous_user_id:
-                return False
-
-        # Identify audio files to potentially delete
-        audio_urls = set()
-        if recipe.intro_audio_url:
-            audio_urls.add(recipe.intro_audio_url)
-        if recipe.outro_audio_url:
-            audio_urls.add(recipe.outro_audio_url)
-        if recipe.ingredients_audio_url:
-            audio_urls.add(recipe.ingredients_audio_url)
-            
-        if recipe.steps:
-            for step in recipe.steps:
-                if isinstance(step, dict) and step.get("audio_url"):
-                    audio_urls.add(step.get("audio_url"))
+            owned = and_(Recipe.user_id.is_(None), Recipe.anonymous_user_id.is_(None))
         
-        # Delete recipe record first
-        await self.db.delete(recipe)
+        result = await self.db.execute(
+            delete(Recipe)
+            .where(Recipe.id == recipe_id, owned)
+            .returning(
+                Recipe.intro_audio_url,
+                Recipe.outro_audio_url,
+                Recipe.ingredients_audio_url,
+                Recipe.steps
+            )
+        )
+        recipe = result.first()
+        if not recipe:
+            return False
         await self.db.commit()
+
+        # Identify audio files to potentially delete
+        audio_urls = _audio_urls(
+            recipe.intro_audio_url, recipe.outro_audio_url, recipe.ingredients_audio_url, recipe.steps
+        )
+        if not audio_urls:
+            return True
         
-        # Check if audio files are still in use by other recipes before deleting from disk
+        # The deleted recipe's recipe_audio rows went with it (ON DELETE CASCADE), so
+        # any URL still listed is used by another recipe; one indexed query covers all
+        result = await self.db.execute(
+            select(RecipeAudio.audio_url).where(RecipeAudio.audio_url.in_(audio_urls)).distinct()
+        )
+        unused_urls = audio_urls - set(result.scalars())
         tts_service = get_tts_service()
         
-        for url in audio_urls:
-            # Check usage in other recipes
-            # Cast JSON steps to string for searching
-            stmt = select(func.count(Recipe.id)).where(
-                or_(
-                    Recipe.intro_audio_url == url,
-                    Recipe.outro_audio_url == url,
-                    Recipe.ingredients_audio_url == url,
-                    cast(Recipe.steps, String).like(f'%{url}%')
-                )
-            )
-            result = await self.db.execute(stmt)
-            count = result.scalar()
-            
-            if count == 0:
-                tts_service.delete_audio(url)
-
+        # File deletes are independent, so they run concurrently off the event loop
+        await asyncio.gather(
+            *(tts_service.delete_audio(url) for url in unused_urls),
+            return_exceptions=True
+        )
         return True
     
     async def count_recipes(self) -> int:
@@ -260,73 +393,109 @@ class RecipeService:
             conditions.append(or_(*ownership))
         
         result = await self.db.execute(
-            select(Recipe).where(and_(*conditions))
+            _select_recipe().where(and_(*conditions)).limit(1)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_saved_copy(
+        self,
+        recipe_id: UUID,
+        user_id: Optional[int] = None,
+        anonymous_user_id: Optional[str] = None
+    ) -> Optional[Recipe]:
+        """Get the user's own recipe for the same URL as recipe_id, in one query"""
+        ownership = []
+        if user_id:
+            ownership.append(Recipe.user_id == user_id)
+        if anonymous_user_id:
+            ownership.append(Recipe.anonymous_user_id == anonymous_user_id)
+        if not ownership:
+            return None
+        
+        source_url = select(Recipe.source_url).where(Recipe.id == recipe_id).scalar_subquery()
+        result = await self.db.execute(
+            _select_recipe().where(Recipe.source_url == source_url, or_(*ownership)).limit(1)
         )
         return result.scalar_one_or_none()
     
     async def copy_recipe_to_user(
         self,
-        recipe_id: str,
+        recipe_id: UUID,
         user_id: Optional[int] = None,
         anonymous_user_id: Optional[str] = None,
         commit: bool = True
     ) -> Optional[Recipe]:
         """Copy a shared recipe to user's profile"""
-        original = await self.get_recipe(recipe_id)
-        if not original:
-            return None
+        # INSERT ... SELECT copies the row server-side, so the original is never
+        # loaded; None if it doesn't exist or the user already has this URL
+        stmt = pg_insert(Recipe).from_select(
+            [column.key for column in _COPIED_COLUMNS] + ["user_id", "anonymous_user_id", "is_public"],
+            select(
+                *_COPIED_COLUMNS,
+                literal(user_id, Integer),
+                literal(anonymous_user_id, String),
+                false()
+            ).where(Recipe.id == recipe_id)
+        ).on_conflict_do_nothing().returning(Recipe)
         
-        # Create a copy for the user
-        new_recipe = Recipe(
-            title=original.title,
-            source_url=original.source_url,
-            source_type=original.source_type,
-            description=original.description,
-            image_url=original.image_url,
-            prep_time=original.prep_time,
-            cook_time=original.cook_time,
-            total_time=original.total_time,
-            servings=original.servings,
-            ingredients=original.ingredients,
-            steps=original.steps,
-            tags=original.tags,
-            raw_content=original.raw_content,
-            intro_text=original.intro_text,
-            outro_text=original.outro_text,
-            intro_audio_url=original.intro_audio_url,
-            outro_audio_url=original.outro_audio_url,
-            ingredients_audio_url=original.ingredients_audio_url,
-            user_id=user_id,
-            anonymous_user_id=anonymous_user_id,
-            is_public=False
-        )
-        
-        self.db.add(new_recipe)
+        result = await self.db.execute(stmt)
+        new_recipe = result.scalar_one_or_none()
+        if new_recipe is None:
+            return None
+        await self._link_audio(new_recipe.id, _audio_urls(
+            new_recipe.intro_audio_url, new_recipe.outro_audio_url, new_recipe.ingredients_audio_url, new_recipe.steps
+        ))
         if commit:
             await self.db.commit()
-            await self.db.refresh(new_recipe)
-        else:
-            await self.db.flush()
-            await self.db.refresh(new_recipe)
         
         return new_recipe
     
+    async def copy_parsed_recipe(
+        self,
+        url: str,
+        voice_id: Optional[str],
+        user_id: Optional[int] = None,
+        anonymous_user_id: Optional[str] = None
+    ) -> Optional[Recipe]:
+        """Copy an earlier parse of this URL (by any user) to the user, if one is cached"""
+        key = _parsed_recipe_key(url, voice_id)
+        recipe_id = _parsed_recipe_ids.get(key)
+        if recipe_id is None:
+            return None
+        
+        recipe = await self.copy_recipe_to_user(
+            recipe_id,
+            user_id=user_id,
+            anonymous_user_id=anonymous_user_id
+        )
+        if recipe is None:
+            # The original was deleted since it was cached
+            _parsed_recipe_ids.pop(key, None)
+        return recipe
+    
+    def remember_parsed_recipe(self, url: str, voice_id: Optional[str], recipe_id: UUID) -> None:
+        """Record a freshly parsed recipe so later submissions of the URL can reuse it"""
+        _parsed_recipe_ids[_parsed_recipe_key(url, voice_id)] = recipe_id
+    
     async def migrate_anonymous_recipes(
         self,
         anonymous_user_id: str,
         user_id: int
     ) -> int:
         """Migrate recipes from anonymous user to authenticated user"""
+        # One server-side UPDATE (anonymous_user_id leads uq_recipes_anon_url)
+        # instead of loading every recipe and flushing a row at a time. URLs the
+        # user already has are left with the anonymous owner (one recipe per URL)
+        owned = aliased(Recipe)
         result = await self.db.execute(
-            select(Recipe).where(Recipe.anonymous_user_id == anonymous_user_id)
+            update(Recipe)
+            .where(
+                Recipe.anonymous_user_id == anonymous_user_id,
+                ~select(owned.id)
+                .where(owned.user_id == user_id, owned.source_url == Recipe.source_url)
+                .exists()
+            )
+            .values(user_id=user_id, anonymous_user_id=None)
         )
-        recipes = result.scalars().all()
-        
-        count = 0
-        for recipe in recipes:
-            recipe.user_id = user_id
-            recipe.anonymous_user_id = None
-            count += 1
-        
         await self.db.commit()
-        return count
+        return result.rowcount
@@ -1,43 +1,142 @@
+import asyncio
 import httpx
+import orjson
 import re
 import os
 import uuid
 import tempfile
-from bs4 import BeautifulSoup
-from typing import Tuple, Optional
-from urllib.parse import urlparse, parse_qs
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+from functools import lru_cache
+from typing import NamedTuple, Tuple, Optional
+from cachetools import TTLCache
+from urllib.parse import urlparse
+from app.services.http_client import get_http_client
+
+# Compiled once at import rather than on every scrape
+_RECIPE_CONTAINER_CLASSES = re.compile(r"recipe-content|recipe-body|wprm-recipe-container|tasty-recipes-entry-content", re.I)
+_RECIPE_CLASSES = re.compile(r"recipe|ingredient|instruction|directions", re.I)
+_RECIPE_ID = re.compile(r"recipe", re.I)
+_ARTICLE_CLASSES = re.compile(r"entry-content|post-content|article-content", re.I)
+_JUNK_CLASSES = re.compile(r'\b(nav|menu|footer|sidebar|widget|ad|banner|social|share|popup|modal|related|comments)\b', re.I)
+_BLANK_LINES = re.compile(r'\n\s*\n')
+_SPACES = re.compile(r'[ \t]+')
+# Video id from youtu.be/ID, youtube.com/watch?...v=ID, /embed/ID, /v/ID, /shorts/ID, /live/ID
+_YOUTUBE_ID = re.compile(r'(?:youtu\.be/|youtube\.com/(?:watch\?(?:[^#]*&)?v=|embed/|v/|shorts/|live/))([A-Za-z0-9_-]{11})')
+
+# C0/C1 control characters and DEL, minus tab/newline/carriage return, which
+# the whitespace normalization in _clean_text handles
+_CONTROL_CHARS = dict.fromkeys(
+    [c for c in range(32) if c not in (9, 10, 13)] + [127] + list(range(0x80, 0xA0))
+)
+
+# Parsed pages by URL with their validators, for conditional re-fetches
+class _CachedPage(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    result: Tuple[str, str, Optional[str]]
+
+
+_page_cache = TTLCache(maxsize=512, ttl=86400)
+
+# yt-dlp + ffmpeg audio downloads running at once, across all requests
+_download_semaphore = asyncio.Semaphore(2)
+
+# Where to look for the recipe body, best first: (attribute or "tag", regex or exact value)
+_CONTENT_SELECTORS = (
+    ("class", _RECIPE_CONTAINER_CLASSES),
+    ("class", _RECIPE_CLASSES),
+    ("id", _RECIPE_ID),
+    ("role", "main"),
+    ("class", _ARTICLE_CLASSES),
+    ("tag", "article"),
+    ("tag", "main"),
+)
+# Every node any of the selectors above can match
+_CONTENT_CANDIDATES = '[class], [id], [role="main"], article, main'
+
+# Removed from the chosen container, along with _JUNK_CLASSES matches
+_NON_CONTENT_TAGS = frozenset(["nav", "footer", "header", "aside", "form", "button"])
+
+
+# Module-level (not methods) so the cache doesn't hold on to the service;
+# each ingest checks the same URL more than once
+@lru_cache(maxsize=2048)
+def _is_youtube_url(url: str) -> bool:
+    parsed = urlparse(url)
+    return any(domain in parsed.netloc for domain in ["youtube.com", "youtu.be", "www.youtube.com"])
+
+
+@lru_cache(maxsize=2048)
+def _extract_youtube_id(url: str) -> Optional[str]:
+    match = _YOUTUBE_ID.search(url)
+    return match.group(1) if match else None
+
+
+def _html_body(response: httpx.Response):
+    """Page body for the parser: raw bytes when they're UTF-8 (lexbor decodes
+    those itself), otherwise text decoded with the declared charset."""
+    encoding = (response.charset_encoding or "utf-8").lower()
+    if encoding in ("utf-8", "utf8"):
+        return response.content
+    return response.text
+
+
+def _meta_content(tree: LexborHTMLParser, selector: str) -> Optional[str]:
+    """content attribute of the first matching <meta>, if any."""
+    node = tree.css_first(selector)
+    return node.attributes.get("content") if node else None
+
+
+def _matches(node: LexborNode, attr: str, pattern) -> bool:
+    """Whether node's attr (or tag name) matches a _CONTENT_SELECTORS entry."""
+    value = node.tag if attr == "tag" else node.attributes.get(attr)
+    if not value:
+        return False
+    if isinstance(pattern, re.Pattern):
+        return pattern.search(value) is not None
+    return value == pattern
+
+
+def _is_junk(node: LexborNode) -> bool:
+    if node.tag in _NON_CONTENT_TAGS:
+        # Be careful not to remove recipe headers like <h2>Ingredients</h2>
+        parent = node.parent
+        return not (node.tag == "header" and parent and parent.tag == "article")  # Keep article headers
+    return _JUNK_CLASSES.search(node.attributes.get("class") or "") is not None
+
+
+def _descendants(root: LexborNode, selector: str) -> list:
+    """Matches of selector below root; css() on a node can also match the node itself."""
+    return [node for node in root.css(selector) if node != root]
+
+
+def _decompose_all(nodes: list) -> None:
+    # Innermost first: a descendant always follows its ancestor in document
+    # order, so no node is freed along with a parent before its own turn
+    for node in reversed(nodes):
+        node.decompose()
 
 
 class ScraperService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        # None means the shared client, looked up per request (see client) since
+        # the app's lifespan closes and replaces it
+        self._client = client
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.5",
         }
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+    
     def is_youtube_url(self, url: str) -> bool:
-        parsed = urlparse(url)
-        return any(domain in parsed.netloc for domain in ["youtube.com", "youtu.be", "www.youtube.com"])
+        return _is_youtube_url(url)
     
     def extract_youtube_id(self, url: str) -> Optional[str]:
-        parsed = urlparse(url)
-        
-        if "youtu.be" in parsed.netloc:
-            return parsed.path.strip("/")
-        
-        if "youtube.com" in parsed.netloc or "www.youtube.com" in parsed.netloc:
-            if parsed.path == "/watch":
-                query = parse_qs(parsed.query)
-                return query.get("v", [None])[0]
-            elif "/embed/" in parsed.path:
-                return parsed.path.split("/embed/")[1].split("?")[0]
-            elif "/v/" in parsed.path:
-                return parsed.path.split("/v/")[1].split("?")[0]
-            elif "/shorts/" in parsed.path:
-                return parsed.path.split("/shorts/")[1].split("?")[0]
-        
-        return None
+        return _extract_youtube_id(url)
     
     def download_youtube_audio(self, url: str) -> Optional[str]:
         """Download YouTube audio to a temp file."""
@@ -57,6 +156,7 @@ class ScraperService:
                 'outtmpl': os.path.join(temp_dir, filename + '.%(ext)s'),
                 'quiet': True,
                 'no_warnings': True,
+                'concurrent_fragment_downloads': 4,
             }
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
@@ -67,50 +167,65 @@ class ScraperService:
             print(f"Error downloading audio: {e}")
             return None
 
-    async def scrape_youtube(self, url: str) -> Tuple[str, str, Optional[str]]:
-        """Scrape YouTube video transcript and metadata."""
+    def _fetch_transcript(self, video_id: str) -> str:
+        """Fetch a video's transcript as plain text (blocking; run in a thread)."""
         from youtube_transcript_api import YouTubeTranscriptApi
         
+        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+        return " ".join([entry["text"] for entry in transcript_list])
+    
+    async def _fetch_youtube_meta(self, url: str) -> Tuple[Optional[str], Optional[str], str]:
+        """Fetch a video page's og:title, og:image and description."""
+        response = await self.client.get(url, headers=self.headers)
+        tree = LexborHTMLParser(_html_body(response))
+        
+        title = _meta_content(tree, 'meta[property="og:title"]')
+        thumbnail = _meta_content(tree, 'meta[property="og:image"]')
+        description = (
+            _meta_content(tree, 'meta[property="og:description"]')
+            or _meta_content(tree, 'meta[name="description"]')
+            or ""
+        )
+        return title, thumbnail, description
+
+    async def scrape_youtube(self, url: str) -> Tuple[str, str, Optional[str]]:
+        """Scrape YouTube video transcript and metadata."""
         video_id = self.extract_youtube_id(url)
         if not video_id:
             raise ValueError("Could not extract YouTube video ID from URL")
         
+        # Transcript (blocking client, so in a thread) and page metadata are
+        # independent; fetch both at once
+        transcript_result, meta_result = await asyncio.gather(
+            asyncio.to_thread(self._fetch_transcript, video_id),
+            self._fetch_youtube_meta(url),
+            return_exceptions=True
+        )
+        
         # Get transcript
         transcript = ""
-        try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            transcript = " ".join([entry["text"] for entry in transcript_list])
-        except Exception as e:
-            print(f"Warning: Could not fetch YouTube transcript: {e}")
+        if isinstance(transcript_result, Exception):
+            print(f"Warning: Could not fetch YouTube transcript: {transcript_result}")
             # Fallback to audio download or description
+        else:
+            transcript = transcript_result
         
         # Get video title and metadata from page
         title = "YouTube Recipe Video"
         thumbnail = None
         description = ""
         
-        try:
-            async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                response = await client.get(url, headers=self.headers)
-                soup = BeautifulSoup(response.text, "lxml")
-                
-                title_tag = soup.find("meta", property="og:title")
-                if title_tag:
-                    title = title_tag.get("content", title)
-                
-                thumb_tag = soup.find("meta", property="og:image")
-                if thumb_tag:
-                    thumbnail = thumb_tag.get("content")
-                    
-                desc_tag = soup.find("meta", property="og:description") or soup.find("meta", {"name": "description"})
-                if desc_tag:
-                    description = desc_tag.get("content", "")
-        except Exception as e:
-            print(f"Warning: Could not fetch YouTube metadata: {e}")
+        if isinstance(meta_result, Exception):
+            print(f"Warning: Could not fetch YouTube metadata: {meta_result}")
+        else:
+            meta_title, thumbnail, description = meta_result
+            title = meta_title or title
         
         if not transcript:
             print(f"Transcript API failed, attempting audio download for {url}")
-            audio_path = self.download_youtube_audio(url)
+            # Blocking download + transcode, so it runs in a thread
+            async with _download_semaphore:
+                audio_path = await asyncio.to_thread(self.download_youtube_audio, url)
             if audio_path:
                 print(f"Audio downloaded to {audio_path}")
                 transcript = f"[AUDIO_FILE]:{audio_path}"
@@ -123,63 +238,81 @@ class ScraperService:
     
     async def scrape_website(self, url: str) -> Tuple[str, str, Optional[str]]:
         """Scrape recipe content from a website."""
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            response = await client.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, "lxml")
-            
-            # Remove script and style elements
-            for element in soup(["script", "style", "nav", "footer", "header", "aside"]):
-                element.decompose()
-            
-            # Try to get title
-            title = "Recipe"
-            title_tag = soup.find("h1") or soup.find("meta", property="og:title")
-            if title_tag:
-                title = title_tag.get_text(strip=True) if hasattr(title_tag, 'get_text') else title_tag.get("content", title)
-            
-            # Try to get image
-            image_url = None
-            img_tag = soup.find("meta", property="og:image")
-            if img_tag:
-                image_url = img_tag.get("content")
-            
-            # Try to find recipe schema
-            schema_content = self._extract_schema_recipe(soup)
-            if schema_content:
-                return schema_content, title, image_url
-            
-            # Fall back to extracting main content
-            content = self._extract_main_content(soup)
-            
-            return content, title, image_url
+        # Revalidate a previously scraped page; a 304 reuses its parsed result
+        cached = _page_cache.get(url)
+        headers = self.headers
+        if cached:
+            headers = dict(headers)
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        
+        response = await self.client.get(url, headers=headers)
+        if cached and response.status_code == 304:
+            return cached.result
+        response.raise_for_status()
+        
+        result = self._parse_website(_html_body(response))
+        
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if etag or last_modified:
+            _page_cache[url] = _CachedPage(etag, last_modified, result)
+        return result
     
-    def _extract_schema_recipe(self, soup: BeautifulSoup) -> Optional[str]:
-        """Try to extract structured recipe data from JSON-LD schema."""
-        import json
+    def _parse_website(self, html) -> Tuple[str, str, Optional[str]]:
+        """Extract (content, title, image_url) from a recipe page's HTML."""
+        tree = LexborHTMLParser(html)
+        
+        # Try to find recipe schema (before <script> tags are stripped below)
+        schema_content = self._extract_schema_recipe(tree)
+        
+        # Remove script and style elements
+        _decompose_all(tree.css("script, style, nav, footer, header, aside"))
+        
+        # Try to get title
+        title = "Recipe"
+        h1 = tree.css_first("h1")
+        if h1:
+            title = h1.text(strip=True)
+        else:
+            title = _meta_content(tree, 'meta[property="og:title"]') or title
+        
+        # Try to get image
+        image_url = _meta_content(tree, 'meta[property="og:image"]')
         
-        schema_tags = soup.find_all("script", type="application/ld+json")
+        if schema_content:
+            return schema_content, title, image_url
+        
+        # Fall back to extracting main content
+        content = self._extract_main_content(tree)
+        
+        return content, title, image_url
+    
+    def _extract_schema_recipe(self, tree: LexborHTMLParser) -> Optional[str]:
+        """Try to extract structured recipe data from JSON-LD schema."""
+        schema_tags = tree.css('script[type="application/ld+json"]')
         
         for tag in schema_tags:
             try:
-                data = json.loads(tag.string)
+                data = orjson.loads(tag.text())
                 
                 # Handle array of schemas
                 if isinstance(data, list):
                     for item in data:
                         if item.get("@type") == "Recipe":
-                            return json.dumps(item, indent=2)
+                            return orjson.dumps(item).decode()
                 
                 # Handle single schema or @graph
                 if data.get("@type") == "Recipe":
-                    return json.dumps(data, indent=2)
+                    return orjson.dumps(data).decode()
                 
                 if "@graph" in data:
                     for item in data["@graph"]:
                         if item.get("@type") == "Recipe":
-                            return json.dumps(item, indent=2)
-            except (json.JSONDecodeError, TypeError):
+                            return orjson.dumps(item).decode()
+            except (orjson.JSONDecodeError, TypeError, AttributeError):
                 continue
         
         return None
@@ -187,62 +320,47 @@ class ScraperService:
     def _clean_text(self, text: str) -> str:
         """Clean text by removing extra whitespace and common artifacts."""
         # Remove Unicode control characters
-        text = "".join(ch for ch in text if ch.isprintable())
+        text = text.translate(_CONTROL_CHARS)
         
         # Replace multiple newlines/spaces
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        text = re.sub(r'[ \t]+', ' ', text)
+        text = _BLANK_LINES.sub('\n\n', text)
+        text = _SPACES.sub(' ', text)
         
         return text.strip()
 
-    def _extract_main_content(self, soup: BeautifulSoup) -> str:
+    def _extract_main_content(self, tree: LexborHTMLParser) -> str:
         """Extract main content from page."""
         # 1. Basic cleanup (safe)
-        for tag in soup(['script', 'style', 'noscript', 'iframe', 'svg', 'meta', 'link']):
-            tag.decompose()
+        _decompose_all(tree.css("script, style, noscript, iframe, svg, meta, link"))
 
         # 2. Find the best container BEFORE aggressive cleaning
-        content_selectors = [
-            {"class_": re.compile(r"recipe-content|recipe-body|wprm-recipe-container|tasty-recipes-entry-content", re.I)},
-            {"class_": re.compile(r"recipe|ingredient|instruction|directions", re.I)},
-            {"id": re.compile(r"recipe", re.I)},
-            {"role": "main"},
-            {"class_": re.compile(r"entry-content|post-content|article-content", re.I)},
-            {"tag": "article"},
-            {"tag": "main"},
-        ]
+        # One scan records each selector's first match in document order
+        first_matches = [None] * len(_CONTENT_SELECTORS)
+        for node in tree.root.css(_CONTENT_CANDIDATES):
+            for rank, (attr, pattern) in enumerate(_CONTENT_SELECTORS):
+                if first_matches[rank] is None and _matches(node, attr, pattern):
+                    first_matches[rank] = node
         
         best_container = None
         
-        for selector in content_selectors:
-            if "tag" in selector:
-                found = soup.find(selector["tag"])
-            else:
-                found = soup.find(**selector)
-                
+        for found in first_matches:
             if found:
                 # Check if this container actually has substantial text
-                if len(found.get_text(strip=True)) > 100:
+                if len(found.text(strip=True)) > 100:
                     best_container = found
                     break
         
-        target = best_container or soup.body or soup
+        target = best_container or tree.body or tree.root
         
-        # 3. Aggressive cleanup INSIDE the target
-        # Remove navigation, footers, ads, etc.
-        for tag in target(['nav', 'footer', 'header', 'aside', 'form', 'button']):
-            # Be careful not to remove recipe headers like <h2>Ingredients</h2>
-            if tag.name == 'header' and tag.parent and tag.parent.name == 'article':
-                continue # Keep article headers
-            tag.decompose()
-
-        # Remove elements with classes that suggest UI junk
-        junk_classes = re.compile(r'\b(nav|menu|footer|sidebar|widget|ad|banner|social|share|popup|modal|related|comments)\b', re.I)
-        for tag in target.find_all(class_=junk_classes):
-            tag.decompose()
+        # 3. Aggressive cleanup INSIDE the target, in one scan
+        # Remove navigation, footers, ads, and elements with classes that suggest UI junk
+        _decompose_all([
+            tag for tag in _descendants(target, "nav, footer, header, aside, form, button, [class]")
+            if _is_junk(tag)
+        ])
 
         # 4. Extract text cleanly
-        return self._clean_text(target.get_text(separator="\n", strip=True))
+        return self._clean_text(target.text(separator="\n", strip=True))
 
     
     async def scrape(self, url: str) -> dict:
@@ -265,6 +383,12 @@ class ScraperService:
             }
 
 
+_scraper_service = None
+
+
 def get_scraper_service() -> ScraperService:
-    return ScraperService()
+    global _scraper_service
+    if _scraper_service is None:
+        _scraper_service = ScraperService()
+    return _scraper_service
 
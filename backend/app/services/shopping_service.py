@@ -1,15 +1,22 @@
 import logging
-import sys
 import re
+from functools import lru_cache
 from typing import List, Dict
 from urllib.parse import quote_plus
 
-# Configure logging to ensure it appears in container logs
 logger = logging.getLogger(__name__)
-handler = logging.StreamHandler(sys.stdout)
-handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(handler)
-logger.setLevel(logging.INFO)
+
+# Ingredient-name cleanup patterns, compiled once
+# Leading quantities like "2 cups", "1/2 lb", etc.
+_QTY_UNIT_RE = re.compile(r'^[\d\s\/\.\,]+\s*(cups?|tbsp?|tsp?|oz|lb|g|kg|ml|l|pieces?|cloves?|stalks?|bunch|head|can|jar|bottle|package|bag)\s+', re.IGNORECASE)
+_QTY_RE = re.compile(r'^[\d\s\/\.\,]+\s+')
+# Characters a leading quantity can start with; names starting with anything else
+# (most of them, e.g. "salt") skip both quantity passes
+_LEADING_CHARS = frozenset('0123456789/.,')
+# Parenthetical notes
+_PAREN_RE = re.compile(r'\s*\([^)]*\)')
+# "for garnish", "optional", etc.
+_TRAIL_RE = re.compile(r',?\s*(for garnish|optional|to taste|as needed|divided).*$', re.IGNORECASE)
 
 class ShoppingService:
     """
@@ -40,13 +47,6 @@ class ShoppingService:
             {"name": "Asda", "domain": "asda.com", "search_url": "https://groceries.asda.com/search/{query}"},
             {"name": "Ocado", "domain": "ocado.com", "search_url": "https://www.ocado.com/search?entry={query}"},
         ],
-        "UK": [  # Alias for GB
-            {"name": "Amazon UK", "domain": "amazon.co.uk", "search_url": "https://www.amazon.co.uk/s?k={query}&i=grocery"},
-            {"name": "Tesco", "domain": "tesco.com", "search_url": "https://www.tesco.com/groceries/en-GB/search?query={query}"},
-            {"name": "Sainsbury's", "domain": "sainsburys.co.uk", "search_url": "https://www.sainsburys.co.uk/gol-ui/SearchResults/{query}"},
-            {"name": "Asda", "domain": "asda.com", "search_url": "https://groceries.asda.com/search/{query}"},
-            {"name": "Ocado", "domain": "ocado.com", "search_url": "https://www.ocado.com/search?entry={query}"},
-        ],
         "IN": [
             {"name": "Amazon India", "domain": "amazon.in", "search_url": "https://www.amazon.in/s?k={query}&i=grocery"},
             {"name": "BigBasket", "domain": "bigbasket.com", "search_url": "https://www.bigbasket.com/ps/?q={query}"},
@@ -81,6 +81,26 @@ class ShoppingService:
         ]
     }
 
+    # Alternative country codes that share another country's sites
+    COUNTRY_ALIASES = {
+        "UK": "GB",
+    }
+
+    # Per country, the top 3 sites (shown in the UI) as (name, domain, url
+    # prefix, url suffix); filled in once by _compile_sites() below
+    _TOP_SITES: Dict[str, tuple] = {}
+
+    @classmethod
+    def _compile_sites(cls) -> None:
+        """Split each search_url around {query} so links are built by concatenation."""
+        cls._TOP_SITES = {
+            country_code: tuple(
+                (site["name"], site["domain"], *site["search_url"].split("{query}", 1))
+                for site in sites[:3]
+            )
+            for country_code, sites in cls.GROCERY_SITES.items()
+        }
+
     def __init__(self):
         pass
 
@@ -101,71 +121,89 @@ class ShoppingService:
         # 1. Determine Country Code
         country_code = self._parse_country_code(country)
         
-        # 2. Get grocery sites for this country
-        sites = self.GROCERY_SITES.get(country_code, self.GROCERY_SITES["WT"])
-        
-        # 3. Clean and encode the ingredient name for URL
+        # 2. Clean the ingredient name for the search query
         clean_name = self._clean_ingredient_name(ingredient_name)
-        encoded_name = quote_plus(clean_name)
         
-        logger.info(f"ShoppingService: Generating links for '{ingredient_name}' | Country: {country_code} | Sites: {len(sites)}")
-        print(f"[DEBUG] ShoppingService: Generating {len(sites)} links for '{ingredient_name}' in {country_code}")
+        logger.info("ShoppingService: Generating links for '%s' | Country: %s", ingredient_name, country_code)
 
-        results = []
+        # 3. Links only depend on (country, name); copy the cached dicts so callers
+        # can't mutate them
+        results = [dict(product) for product in _build_results(country_code, clean_name)]
         
-        # Generate links for each grocery site (limit to top 3 for cleaner UI)
-        for site in sites[:3]:
-            search_url = site["search_url"].replace("{query}", encoded_name)
-            
-            results.append({
-                "title": f"{clean_name} at {site['name']}",
-                "link": search_url,
-                "source": site["domain"],
-                "price": None  # Price will be visible when user clicks the link
-            })
-        
-        logger.info(f"ShoppingService: Generated {len(results)} links for '{ingredient_name}'")
+        logger.info("ShoppingService: Generated %d links for '%s'", len(results), ingredient_name)
         return results
 
     def _parse_country_code(self, country: str) -> str:
         """Parse country string into a 2-letter country code."""
-        if not country:
-            return "WT"
-        
-        input_upper = country.upper().strip()
-        
-        # If input is like 'US-EN', extract 'US'
-        if '-' in input_upper:
-            parts = input_upper.split('-')
-            if len(parts[0]) == 2:
-                country_code = parts[0]
-                if country_code in self.GROCERY_SITES:
-                    return country_code
-        
-        # If input is 'US' (2 chars)
-        if len(input_upper) == 2 and input_upper in self.GROCERY_SITES:
-            return input_upper
-        
-        # Default fallback
-        return "WT"
+        return _parse_country_code_cached(country)
 
     def _clean_ingredient_name(self, name: str) -> str:
         """Clean ingredient name for search query."""
-        # Remove common measurement words and special characters
-        # Keep the core ingredient name
-        clean = name.strip()
-        
-        # Remove leading quantities like "2 cups", "1/2 lb", etc.
-        clean = re.sub(r'^[\d\s\/\.\,]+\s*(cups?|tbsp?|tsp?|oz|lb|g|kg|ml|l|pieces?|cloves?|stalks?|bunch|head|can|jar|bottle|package|bag)\s+', '', clean, flags=re.IGNORECASE)
-        clean = re.sub(r'^[\d\s\/\.\,]+\s+', '', clean)
-        
-        # Remove parenthetical notes
-        clean = re.sub(r'\s*\([^)]*\)', '', clean)
-        
-        # Remove "for garnish", "optional", etc.
-        clean = re.sub(r',?\s*(for garnish|optional|to taste|as needed|divided).*$', '', clean, flags=re.IGNORECASE)
-        
-        return clean.strip() or name
+        return _clean_ingredient_name_cached(name)
+
+
+ShoppingService._compile_sites()
+
+
+# Module-level so self isn't part of the cache key; the same ingredient names and
+# country strings come up across recipes and requests
+@lru_cache(maxsize=4096)
+def _parse_country_code_cached(country: str) -> str:
+    """Parse country string into a 2-letter country code."""
+    # Only a bare code ('US') or a region string ('US-EN') has a code to slice;
+    # anything else ('DENMARK') would otherwise match the wrong country
+    value = (country or "").strip().upper()
+    if len(value) == 2 or (len(value) > 2 and value[2] == "-"):
+        country_code = ShoppingService.COUNTRY_ALIASES.get(value[:2], value[:2])
+        if country_code in ShoppingService.GROCERY_SITES:
+            return country_code
+    
+    # Default fallback
+    return "WT"
+
+
+@lru_cache(maxsize=4096)
+def _clean_ingredient_name_cached(name: str) -> str:
+    """Clean ingredient name for search query."""
+    # Remove common measurement words and special characters
+    # Keep the core ingredient name
+    clean = name.strip()
+    
+    # Remove leading quantities like "2 cups", "1/2 lb", etc.
+    if clean[:1] in _LEADING_CHARS:
+        clean = _QTY_UNIT_RE.sub('', clean)
+        clean = _QTY_RE.sub('', clean)
+    
+    # Remove parenthetical notes
+    clean = _PAREN_RE.sub('', clean)
+    
+    # Remove "for garnish", "optional", etc.
+    clean = _TRAIL_RE.sub('', clean)
+    
+    return clean.strip() or name
+
+
+@lru_cache(maxsize=8192)
+def _build_results(country_code: str, clean_name: str) -> tuple:
+    """Build the product links for a country's top grocery sites."""
+    sites = ShoppingService._TOP_SITES.get(country_code, ShoppingService._TOP_SITES["WT"])
+    encoded_name = _encode(clean_name)
+    return tuple(
+        {
+            "title": f"{clean_name} at {name}",
+            "link": prefix + encoded_name + suffix,
+            "source": domain,
+            "price": None  # Price will be visible when user clicks the link
+        }
+        for name, domain, prefix, suffix in sites
+    )
+
+
+@lru_cache(maxsize=4096)
+def _encode(clean_name: str) -> str:
+    """URL-encode a cleaned ingredient name for a search query."""
+    return quote_plus(clean_name)
+
 
 _shopping_service = None
 
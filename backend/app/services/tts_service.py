@@ -1,7 +1,9 @@
 import asyncio
+import os
 import edge_tts
 import uuid
 from pathlib import Path
+from types import MappingProxyType
 from typing import List, Optional
 
 # Paths for generated audio
@@ -12,6 +14,10 @@ SAMPLE_DIR = STATIC_DIR / "samples"
 STATIC_DIR.mkdir(parents=True, exist_ok=True)
 SAMPLE_DIR.mkdir(parents=True, exist_ok=True)
 
+# URL prefixes for files under STATIC_DIR and SAMPLE_DIR
+AUDIO_URL_PREFIX = f"/static/{STATIC_DIR.relative_to(STATIC_ROOT).as_posix()}/"
+SAMPLE_URL_PREFIX = f"/static/{SAMPLE_DIR.relative_to(STATIC_ROOT).as_posix()}/"
+
 AVAILABLE_VOICES = [
     {
         "id": "en-US-ChristopherNeural",
@@ -43,7 +49,15 @@ AVAILABLE_VOICES = [
     },
 ]
 
+# Read-only views of the voice metadata, shared by every voice listing
+_VOICE_BASE = tuple(MappingProxyType(voice) for voice in AVAILABLE_VOICES)
+_VOICE_IDS = frozenset(voice["id"] for voice in AVAILABLE_VOICES)
+_SAMPLE_PATHS = {voice_id: str(SAMPLE_DIR / f"{voice_id}.mp3") for voice_id in _VOICE_IDS}
+
 DEFAULT_VOICE = AVAILABLE_VOICES[0]["id"]
+
+# Sample URLs by voice ID, filled in once each sample file is known to exist
+_SAMPLE_URL_CACHE: dict[str, str] = {}
 SAMPLE_TEXT = (
     "Hi! I'm your Foodly cooking companion. I'm here to walk you through every "
     "recipe step with confidence."
@@ -55,33 +69,35 @@ class TTSService:
         self.default_voice = DEFAULT_VOICE
 
     def is_supported_voice(self, voice_id: Optional[str]) -> bool:
-        if not voice_id:
-            return False
-        return any(voice["id"] == voice_id for voice in AVAILABLE_VOICES)
+        return bool(voice_id) and voice_id in _VOICE_IDS
 
     async def generate_audio(self, text: str, voice: Optional[str] = None, filename: Optional[str] = None) -> str:
         """Generate audio and return the static URL path."""
         voice_id = voice if self.is_supported_voice(voice) else self.default_voice
-        target_name = filename or f"{uuid.uuid4()}.mp3"
+        target_name = filename or f"{uuid.uuid4().hex}.mp3"
         target_path = STATIC_DIR / target_name
-        target_path.parent.mkdir(parents=True, exist_ok=True)
+        # STATIC_DIR exists from import; only nested filenames need a directory
+        if "/" in target_name:
+            target_path.parent.mkdir(parents=True, exist_ok=True)
 
         communicate = edge_tts.Communicate(text, voice_id)
         await communicate.save(str(target_path))
 
-        relative = target_path.relative_to(STATIC_ROOT)
-        return f"/static/{relative.as_posix()}"
+        return AUDIO_URL_PREFIX + target_name
 
     async def _ensure_sample_audio(self, voice_id: str) -> str:
-        sample_path = SAMPLE_DIR / f"{voice_id}.mp3"
-        if not sample_path.exists():
+        sample_url = _SAMPLE_URL_CACHE.get(voice_id)
+        if sample_url is not None:
+            return sample_url
+
+        sample_path = _SAMPLE_PATHS[voice_id]
+        if not os.path.exists(sample_path):
             communicate = edge_tts.Communicate(SAMPLE_TEXT, voice_id)
-            await communicate.save(str(sample_path))
-        relative = sample_path.relative_to(STATIC_ROOT)
-        return f"/static/{relative.as_posix()}"
+            await communicate.save(sample_path)
+        sample_url = _SAMPLE_URL_CACHE[voice_id] = f"{SAMPLE_URL_PREFIX}{voice_id}.mp3"
+        return sample_url
 
     async def get_available_voices(self, include_samples: bool = False) -> List[dict]:
-        voices = []
         samples: List[Optional[str]] = [None] * len(AVAILABLE_VOICES)
 
         if include_samples:
@@ -89,32 +105,31 @@ class TTSService:
                 *[self._ensure_sample_audio(voice["id"]) for voice in AVAILABLE_VOICES]
             )
 
-        for voice, sample in zip(AVAILABLE_VOICES, samples):
-            voice_data = dict(voice)
-            voice_data["sample_url"] = sample
-            voices.append(voice_data)
-
-        return voices
+        return [{**base, "sample_url": sample} for base, sample in zip(_VOICE_BASE, samples)]
     
-    def delete_audio(self, audio_url: str) -> bool:
-        """Delete an audio file given its static URL."""
+    async def delete_audio(self, audio_url: str) -> bool:
+        """Delete an audio file given its static URL, off the event loop."""
         if not audio_url or not audio_url.startswith("/static/"):
             return False
-            
+        return await asyncio.to_thread(self._delete_sync, audio_url)
+
+    def _delete_sync(self, audio_url: str) -> bool:
         try:
             # Remove '/static/' prefix
             relative_path = audio_url.replace("/static/", "", 1)
-            file_path = STATIC_ROOT / relative_path
-            
-            if file_path.exists() and file_path.is_file():
-                file_path.unlink()
-                return True
+            os.unlink(STATIC_ROOT / relative_path)
+            return True
+        except (FileNotFoundError, IsADirectoryError):
             return False
         except Exception as e:
             print(f"Error deleting audio file {audio_url}: {e}")
             return False
 
+_tts_service = None
 
 def get_tts_service() -> TTSService:
-    return TTSService()
+    global _tts_service
+    if _tts_service is None:
+        _tts_service = TTSService()
+    return _tts_service
 
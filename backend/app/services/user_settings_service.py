@@ -1,17 +1,22 @@
 from typing import Optional
-from sqlalchemy import select
+from cachetools import TTLCache
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user_setting import UserSetting
 from app.services.tts_service import DEFAULT_VOICE
 
+# user_id -> voice_id; voice preferences change rarely but are read on every recipe process.
+# Per-process: another replica may serve a stale voice for up to the TTL after a change
+_voice_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
 
 class UserSettingsService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def _get_record(self, user_id: str) -> Optional[UserSetting]:
+    async def _get_voice_id(self, user_id: str) -> Optional[str]:
         result = await self.db.execute(
-            select(UserSetting).where(UserSetting.user_id == user_id)
+            select(UserSetting.voice_id).where(UserSetting.user_id == user_id)
         )
         return result.scalar_one_or_none()
 
@@ -20,25 +25,38 @@ class UserSettingsService:
         if not user_id:
             return DEFAULT_VOICE
 
-        record = await self._get_record(user_id)
-        if record:
-            return record.voice_id
-
-        # Create a default record for new users to avoid repeated inserts
-        record = UserSetting(user_id=user_id, voice_id=DEFAULT_VOICE)
-        self.db.add(record)
-        await self.db.flush()
-        return record.voice_id
+        voice_id = _voice_cache.get(user_id)
+        if voice_id:
+            return voice_id
+
+        voice_id = await self._get_voice_id(user_id)
+        if voice_id is None:
+            # Create a default record for new users to avoid repeated inserts;
+            # a concurrent request may have beaten us to it
+            result = await self.db.execute(
+                pg_insert(UserSetting)
+                .values(user_id=user_id, voice_id=DEFAULT_VOICE)
+                .on_conflict_do_nothing(index_elements=[UserSetting.user_id])
+                .returning(UserSetting.voice_id)
+            )
+            voice_id = result.scalar_one_or_none()
+            if voice_id is None:
+                voice_id = await self._get_voice_id(user_id)
+
+        _voice_cache[user_id] = voice_id
+        return voice_id
 
     async def set_user_voice(self, user_id: str, voice_id: str) -> str:
-        record = await self._get_record(user_id)
-        if record:
-            record.voice_id = voice_id
-        else:
-            record = UserSetting(user_id=user_id, voice_id=voice_id)
-            self.db.add(record)
-
-        await self.db.flush()
-        return record.voice_id
+        result = await self.db.execute(
+            pg_insert(UserSetting)
+            .values(user_id=user_id, voice_id=voice_id)
+            .on_conflict_do_update(
+                index_elements=[UserSetting.user_id],
+                set_={"voice_id": voice_id, "updated_at": func.now()},
+            )
+            .returning(UserSetting.voice_id)
+        )
+        voice_id = _voice_cache[user_id] = result.scalar_one()
+        return voice_id
 
 
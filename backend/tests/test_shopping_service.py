@@ -0,0 +1,55 @@
+import random
+import re
+
+from app.services.shopping_service import _clean_ingredient_name_cached
+
+
+def _baseline_clean_ingredient_name(name: str) -> str:
+    """ShoppingService._clean_ingredient_name as it was before the regexes were precompiled."""
+    clean = name.strip()
+    clean = re.sub(r'^[\d\s\/\.\,]+\s*(cups?|tbsp?|tsp?|oz|lb|g|kg|ml|l|pieces?|cloves?|stalks?|bunch|head|can|jar|bottle|package|bag)\s+', '', clean, flags=re.IGNORECASE)
+    clean = re.sub(r'^[\d\s\/\.\,]+\s+', '', clean)
+    clean = re.sub(r'\s*\([^)]*\)', '', clean)
+    clean = re.sub(r',?\s*(for garnish|optional|to taste|as needed|divided).*$', '', clean, flags=re.IGNORECASE)
+    return clean.strip() or name
+
+
+CASES = [
+    "salt",
+    "olive oil",
+    "2 cups flour (sifted)",
+    "1/2 tsp salt, to taste",
+    "2 eggs",
+    "2eggs",
+    "1 can 400g tomatoes",
+    "3 cloves garlic, minced",
+    "olive oil for garnish",
+    "1.5 kg chicken (skin on), divided",
+    "basil (optional",
+    "basil, (fresh) for garnish",
+    "3lb 3 cups",
+    "2 cups 3 apples",
+    "  2 Tbsp  butter ",
+    "pepper (to taste) optional",
+    "12",
+    "",
+    "   ",
+]
+
+TOKENS = [
+    "1", "2", "1/2", "3lb", ".5", ",", " ", "  ", "cups", "tbsp", "lb", "g", "can",
+    "flour", "basil", "olive oil", "(fresh)", "(", ")", "for garnish", "optional",
+    "to taste", "as needed", "divided", "Divided", "salt,",
+]
+
+
+def test_clean_ingredient_name_matches_baseline_cases():
+    for name in CASES:
+        assert _clean_ingredient_name_cached(name) == _baseline_clean_ingredient_name(name), name
+
+
+def test_clean_ingredient_name_matches_baseline_fuzz():
+    rng = random.Random(0)
+    for _ in range(20_000):
+        name = "".join(rng.choice(TOKENS) + rng.choice(("", " ")) for _ in range(rng.randint(1, 6)))
+        assert _clean_ingredient_name_cached(name) == _baseline_clean_ingredient_name(name), name